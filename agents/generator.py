@@ -1,188 +1,287 @@
 from langchain_groq import ChatGroq
 from langchain_core.prompts import ChatPromptTemplate
 from schemas.project_spec import ProjectSpec, FileSpec
-from typing import Dict
-import requests
-from bs4 import BeautifulSoup
+from typing import Dict, Optional, Tuple
+from types import MappingProxyType
+from utils.async_utils import run_sync
+from utils.prompts import load_prompt
+from utils.extract import CODE_BLOCK_RE, extract_code
+from utils.ast_edit import parse_source
+from collections import OrderedDict
+from contextlib import aclosing
+import asyncio
+import httpx
+import weakref
+import os
+import lxml.html
 import re
 
+# Upper bound on concurrent outbound doc/PyPI requests per generation run
+_MAX_HTTP_CONNECTIONS = 8
+
+# Map of common packages to their documentation URLs
+_DOC_URLS = MappingProxyType({
+    "langchain": "https://python.langchain.com/docs/get_started/introduction",
+    "langgraph": "https://langchain-ai.github.io/langgraph/",
+    "fastapi": "https://fastapi.tiangolo.com/",
+    "pydantic": "https://docs.pydantic.dev/latest/",
+    "openai": "https://platform.openai.com/docs/api-reference",
+    "anthropic": "https://docs.anthropic.com/claude/reference/getting-started-with-the-api"
+})
+
+# OPTIMIZATION: Network lookups are cached per process so repeated runs in the
+# self-improving loop don't refetch the same packages. Only successful lookups
+# are stored, so failures get retried next time. Each cache is an LRU capped at
+# _LOOKUP_CACHE_SIZE entries so a long-lived server doesn't grow without bound.
+_LOOKUP_CACHE_SIZE = 512
+_PYPI_VERSION_CACHE: OrderedDict[str, str] = OrderedDict()
+_DOC_SNIPPET_CACHE: OrderedDict[str, str] = OrderedDict()
+
+def _cache_get(cache: OrderedDict, key: str) -> Optional[str]:
+    """Cached value for key (marking it most recently used), or None"""
+    value = cache.get(key)
+    if value is not None:
+        cache.move_to_end(key)
+    return value
+
+def _cache_put(cache: OrderedDict, key: str, value: str):
+    """Store a value, evicting the least recently used entry once the cache is full"""
+    cache[key] = value
+    cache.move_to_end(key)
+    if len(cache) > _LOOKUP_CACHE_SIZE:
+        cache.popitem(last=False)
+
 class GeneratorAgent:
     def __init__(self, llm: ChatGroq):
         self.llm = llm
-        with open("prompts/generator.txt", "r") as f:
-            self.prompt_template = f.read()
+        self.prompt_template = load_prompt("generator.txt")
+        # OPTIMIZATION: Parse the template and build the chain once, not per file
+        self.chain = ChatPromptTemplate.from_template(self.prompt_template) | self.llm
+        # Upper bound on concurrent per-file LLM calls - read here rather than at import
+        # so a GEN_CONCURRENCY set in .env (loaded when the workflow is built) applies
+        self.concurrency = int(os.getenv("GEN_CONCURRENCY", "10"))
+        # One HTTP client per event loop, shared by the code and support branches and
+        # reused across runs (run_sync keeps a single persistent loop)
+        self._http_clients = weakref.WeakKeyDictionary()
     
     def generate_files(self, project_spec: ProjectSpec) -> Dict[str, str]:
-        """Generate all code files in a SINGLE LLM call for efficiency"""
-        
-        # Fetch latest documentation for dependencies
-        latest_docs = self._fetch_latest_docs(project_spec.dependencies)
-        
-        # OPTIMIZATION: Generate ALL files in one call instead of per-file
-        generated_files = self._generate_all_files_batch(project_spec, latest_docs)
+        """Generate all code files with concurrent per-file LLM calls"""
+        return run_sync(self.agenerate_files(project_spec))
+    
+    def generate_code_files(self, project_spec: ProjectSpec) -> Dict[str, str]:
+        """Generate only the planned (LLM-written) files"""
+        return run_sync(self.agenerate_code_files(project_spec))
+    
+    def generate_support_files(self, project_spec: ProjectSpec) -> Dict[str, str]:
+        """Generate only requirements.txt, README.md and .env.example (no LLM)"""
+        return run_sync(self.agenerate_support_files(project_spec))
+    
+    async def agenerate_files(self, project_spec: ProjectSpec) -> Dict[str, str]:
+        """Async version of generate_files - planned and support files are produced concurrently"""
+        generated_files, support_files = await asyncio.gather(
+            self.agenerate_code_files(project_spec),
+            self.agenerate_support_files(project_spec)
+        )
+        generated_files.update(support_files)
+        return generated_files
+    
+    async def agenerate_code_files(self, project_spec: ProjectSpec) -> Dict[str, str]:
+        """Fetch docs, then generate every planned file concurrently"""
+        latest_docs = await self._fetch_latest_docs(self._http_client(), project_spec.dependencies)
         
-        # Generate additional files (no LLM needed)
-        generated_files["requirements.txt"] = self._generate_requirements(project_spec)
-        generated_files["README.md"] = self._generate_readme(project_spec)
-        generated_files[".env.example"] = self._generate_env_example(project_spec)
+        # OPTIMIZATION: One LLM call per file, all in flight at once
+        return await self._generate_files_concurrently(project_spec, latest_docs)
+    
+    async def agenerate_support_files(self, project_spec: ProjectSpec) -> Dict[str, str]:
+        """PyPI versions only feed requirements.txt, so this runs alongside the LLM work"""
+        pypi_versions = await self._fetch_pypi_versions(self._http_client(), project_spec.dependencies)
         
-        return generated_files
+        return {
+            "requirements.txt": self._generate_requirements(project_spec, pypi_versions),
+            "README.md": self._generate_readme(project_spec),
+            ".env.example": self._generate_env_example(project_spec)
+        }
     
-    def _generate_all_files_batch(self, project_spec: ProjectSpec, latest_docs: Dict[str, str]) -> Dict[str, str]:
-        """Generate all files in a single LLM call - MAJOR OPTIMIZATION"""
+    def _http_client(self) -> httpx.AsyncClient:
+        """Pooled HTTP/2 client for doc and PyPI requests on the running loop
         
-        # Build comprehensive prompt for all files
-        prompt = self._build_batch_generation_prompt()
-        chain = ChatPromptTemplate.from_template(prompt) | self.llm
+        OPTIMIZATION: TLS handshakes are amortized and requests multiplex over shared
+        connections. The connection limit doubles as the concurrency cap: extra requests
+        wait for a free pooled connection instead of opening more sockets.
+        """
+        loop = asyncio.get_running_loop()
+        client = self._http_clients.get(loop)
+        if client is None or client.is_closed:
+            client = self._http_clients[loop] = self._new_http_client()
+        return client
+    
+    def _new_http_client(self) -> httpx.AsyncClient:
+        """Build the pooled HTTP/2 client - see _http_client"""
+        return httpx.AsyncClient(
+            transport=httpx.AsyncHTTPTransport(
+                http2=True,
+                retries=2,
+                limits=httpx.Limits(max_connections=_MAX_HTTP_CONNECTIONS)
+            ),
+            timeout=5.0
+        )
+    
+    async def _generate_files_concurrently(self, project_spec: ProjectSpec, latest_docs: Dict[str, str]) -> Dict[str, str]:
+        """Issue every per-file prompt at once so network latency overlaps (~1 RTT total)"""
         
-        # Build documentation context
-        doc_context = "\n\n".join([
-            f"Latest {pkg} documentation snippet:\n{doc}" 
+        # Shared context is identical for every file - build it once
+        project_context = self._build_project_context(project_spec)
+        dependencies = ", ".join(d.package for d in project_spec.dependencies)
+        doc_context = "\n\n".join(
+            f"Latest {pkg} documentation snippet:\n{doc}"
             for pkg, doc in latest_docs.items()
-        ])
+        )
         
-        # Build file specifications
-        files_spec = "\n\n".join([
-            f"File: {file_spec.path}\n"
-            f"Description: {file_spec.description}\n"
-            f"Type: {file_spec.file_type.value}"
-            for file_spec in project_spec.files
-        ])
+        # Cap in-flight LLM calls so large projects stay under the provider rate limit
+        semaphore = asyncio.Semaphore(self.concurrency)
         
-        response = chain.invoke({
-            "project_name": project_spec.project_name,
-            "project_description": project_spec.description,
-            "files_specification": files_spec,
-            "dependencies": [d.package for d in project_spec.dependencies],
-            "latest_docs": doc_context,
-            "entry_point": project_spec.entry_point
-        })
-        
-        # Parse response to extract all files
-        return self._parse_multi_file_response(response.content, project_spec.files)
-    
-    def _build_batch_generation_prompt(self) -> str:
-        """Build prompt that generates all files at once"""
-        return """You are an expert software engineer. Generate ALL code files for this project in a single response.
-
-Project Details:
-- Name: {project_name}
-- Description: {project_description}
-- Entry Point: {entry_point}
-
-Files to Generate:
-{files_specification}
-
-Dependencies: {dependencies}
-
-{latest_docs}
-
-CRITICAL REQUIREMENTS:
-1. Use LATEST patterns and syntax:
-   - LangChain: Use LCEL with | operator, NOT LLMChain
-   - Imports: from langchain_openai import ChatOpenAI (not from langchain.chat_models)
-   - Pydantic: v2 syntax with model_config, NOT class Config
-   - Type hints: Use native Python 3.10+ (list[str], dict[str, int]) NOT typing.List
-   - Modern async/await patterns where appropriate
-
-2. Include proper error handling:
-   - try/except for JSON parsing with JSONDecodeError
-   - .get() for dict access or proper KeyError handling
-   - try/except for HTTP requests with requests.exceptions
-   - with statements for file operations
-
-3. Add type hints to all functions
-
-4. Make code production-ready with validation and error messages
-
-FORMAT YOUR RESPONSE AS:
-```python:filename.py
-# code here
-```
-
-```python:another_file.py
-# code here
-```
-
-Generate complete, working code for ALL files now:"""
-    
-    def _parse_multi_file_response(self, content: str, file_specs: list[FileSpec]) -> Dict[str, str]:
-        """Parse LLM response containing multiple files"""
-        files = {}
+        async def generate_bounded(file_spec: FileSpec) -> Tuple[str, str]:
+            async with semaphore:
+                return await self._generate_file_async(file_spec, project_context, dependencies, doc_context)
         
-        # Pattern to match code blocks with filenames
-        # Matches: ```python:filename.py or ```filename.py
-        pattern = r'```(?:python)?:([^\n]+)\n(.*?)```'
-        matches = re.findall(pattern, content, re.DOTALL)
+        results = await asyncio.gather(*[
+            generate_bounded(file_spec) for file_spec in project_spec.files
+        ])
         
-        for filename, code in matches:
-            filename = filename.strip()
-            code = code.strip()
-            files[filename] = code
+        return {path: code for path, code in results if code}
+    
+    async def _generate_file_async(self, file_spec: FileSpec, project_context: str,
+                                   dependencies: str, doc_context: str) -> Tuple[str, str]:
+        """Generate a single file with its own focused prompt"""
+        is_python = file_spec.path.endswith('.py')
+        try:
+            content = await self._stream_until_code_block(self.chain, {
+                "file_path": file_spec.path,
+                "file_description": f"{file_spec.description} (type: {file_spec.file_type.value})",
+                "project_context": project_context,
+                "dependencies": dependencies,
+                "latest_docs": doc_context
+            }, stop_early=is_python)
+            code = extract_code(content, fallback_to_raw=True, outermost=not is_python)
+            if is_python:
+                # OPTIMIZATION: Parse while the other files are still streaming - the
+                # shared parse cache answers the modernizer's and verifier's later checks
+                parse_source(code)
+            return file_spec.path, code
+        except Exception as e:
+            print(f"Warning: Generation failed for {file_spec.path}: {e}")
+            return file_spec.path, ""
+    
+    async def _stream_until_code_block(self, chain, inputs: Dict[str, str], stop_early: bool = True) -> str:
+        """Stream the response and, if stop_early, stop reading as soon as the code block closes
         
-        # Fallback: if no filename markers, try to match by file count
-        if not files:
-            code_blocks = re.findall(r'```python\n(.*?)```', content, re.DOTALL)
-            for i, code in enumerate(code_blocks):
-                if i < len(file_specs):
-                    files[file_specs[i].path] = code.strip()
+        OPTIMIZATION: Anything the model emits after the closing fence (explanations,
+        usage notes) is discarded anyway - closing the stream early skips those tokens.
+        Only safe for Python files: markdown and other files can legitimately contain
+        several fenced blocks, so those are read to the end.
+        """
+        content = ""
+        async with aclosing(chain.astream(inputs)) as stream:
+            async for chunk in stream:
+                content += chunk.content
+                # Only re-scan when a fence character arrives
+                if stop_early and '`' in chunk.content and CODE_BLOCK_RE.search(content):
+                    break
+        return content
+    
+    def _build_project_context(self, project_spec: ProjectSpec) -> str:
+        """Describe the project and its file layout so each file fits the whole"""
+        files_overview = "\n".join(
+            f"- {file_spec.path}: {file_spec.description}"
+            for file_spec in project_spec.files
+        )
         
-        return files
+        return (
+            f"Project: {project_spec.project_name}\n"
+            f"Description: {project_spec.description}\n"
+            f"Entry Point: {project_spec.entry_point}\n"
+            f"Project Files:\n{files_overview}"
+        )
     
-    def _fetch_latest_docs(self, dependencies) -> Dict[str, str]:
+    async def _fetch_latest_docs(self, client: httpx.AsyncClient, dependencies) -> Dict[str, str]:
         """Fetch latest documentation snippets for key dependencies"""
         docs = {}
         
-        # Map of common packages to their documentation URLs
-        doc_urls = {
-            "langchain": "https://python.langchain.com/docs/get_started/introduction",
-            "langgraph": "https://langchain-ai.github.io/langgraph/",
-            "fastapi": "https://fastapi.tiangolo.com/",
-            "pydantic": "https://docs.pydantic.dev/latest/",
-            "openai": "https://platform.openai.com/docs/api-reference",
-            "anthropic": "https://docs.anthropic.com/claude/reference/getting-started-with-the-api"
-        }
-        
+        # Collect (package, url) pairs up front so every request can be in flight at once
+        targets = []
         for dep in dependencies:
             package_name = dep.package.lower()
-            if package_name in doc_urls:
-                try:
-                    response = requests.get(doc_urls[package_name], timeout=5)
-                    if response.status_code == 200:
-                        soup = BeautifulSoup(response.text, 'html.parser')
-                        text = soup.get_text()[:1000]
-                        docs[package_name] = text
-                except Exception as e:
-                    print(f"Warning: Could not fetch docs for {package_name}: {e}")
-                    docs[package_name] = "No documentation fetched"
+            if package_name in _DOC_URLS:
+                targets.append((package_name, _DOC_URLS[package_name]))
+        
+        if not targets:
+            return docs
+        
+        # OPTIMIZATION: Fetch all docs concurrently - wall time ~max(RTT) instead of sum
+        results = await asyncio.gather(
+            *[self._fetch_doc_snippet(client, url) for _, url in targets],
+            return_exceptions=True
+        )
+        
+        for (package_name, _), result in zip(targets, results):
+            if isinstance(result, Exception):
+                print(f"Warning: Could not fetch docs for {package_name}: {result}")
+                docs[package_name] = "No documentation fetched"
+            else:
+                docs[package_name] = result
         
         return docs
     
-    def _generate_requirements(self, spec: ProjectSpec) -> str:
+    async def _fetch_doc_snippet(self, client: httpx.AsyncClient, url: str) -> str:
+        """Fetch a documentation page and return the first 1000 chars of its text"""
+        cached = _cache_get(_DOC_SNIPPET_CACHE, url)
+        if cached is not None:
+            return cached
+        
+        response = await client.get(url)
+        response.raise_for_status()
+        # OPTIMIZATION: libxml2 parse + C-level text extraction instead of a pure-Python DOM
+        text = lxml.html.fromstring(response.content).text_content()[:1000]
+        
+        _cache_put(_DOC_SNIPPET_CACHE, url, text)
+        return text
+    
+    async def _fetch_pypi_versions(self, client: httpx.AsyncClient, dependencies) -> Dict[str, str]:
+        """Fetch latest PyPI versions for every unpinned dependency concurrently"""
+        packages = [dep.package for dep in dependencies if not dep.version]
+        versions = await asyncio.gather(*[
+            self._get_latest_pypi_version(client, package) for package in packages
+        ])
+        return dict(zip(packages, versions))
+    
+    async def _get_latest_pypi_version(self, client: httpx.AsyncClient, package_name: str) -> str:
+        """Fetch latest version from PyPI API (cached per process)"""
+        cached = _cache_get(_PYPI_VERSION_CACHE, package_name)
+        if cached is not None:
+            return cached
+        
+        try:
+            response = await client.get(f"https://pypi.org/pypi/{package_name}/json")
+            if response.status_code == 200:
+                version = response.json()['info']['version']
+                _cache_put(_PYPI_VERSION_CACHE, package_name, version)
+                return version
+        except:
+            pass
+        return "latest"
+    
+    def _generate_requirements(self, spec: ProjectSpec, pypi_versions: Dict[str, str]) -> str:
         """Generate requirements.txt with explicit versions"""
         lines = []
         for dep in spec.dependencies:
             if dep.version:
                 lines.append(f"{dep.package}=={dep.version}")
+            elif dep.package in pypi_versions:
+                lines.append(f"{dep.package}>={pypi_versions[dep.package]}")
             else:
-                try:
-                    version = self._get_latest_pypi_version(dep.package)
-                    lines.append(f"{dep.package}>={version}")
-                except:
-                    lines.append(dep.package)
+                lines.append(dep.package)
         return "\n".join(lines)
     
-    def _get_latest_pypi_version(self, package_name: str) -> str:
-        """Fetch latest version from PyPI API"""
-        try:
-            response = requests.get(f"https://pypi.org/pypi/{package_name}/json", timeout=5)
-            if response.status_code == 200:
-                data = response.json()
-                return data['info']['version']
-        except:
-            pass
-        return "latest"
-    
     def _generate_readme(self, spec: ProjectSpec) -> str:
         return spec.readme_content or f"""# {spec.project_name}
 
@@ -1,38 +1,59 @@
 import os
+import shutil
+import time
 import zipfile
 from pathlib import Path
 from typing import Dict
 from schemas.project_spec import ProjectSpec
+from utils.fs import FileSystemUtils
 from datetime import datetime
 
 class IntegratorAgent:
-    def __init__(self, output_dir: str = "./output"):
+    def __init__(self, output_dir: str = "./output", keep_project_dir: bool = False):
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(exist_ok=True)
+        # Also write an unzipped copy next to the zip (useful for debugging)
+        self.keep_project_dir = keep_project_dir
+        # Generated projects older than this are deleted from the output directory. Read
+        # here rather than at import so an OUTPUT_TTL_SECONDS set in .env applies
+        self.output_ttl_seconds = int(os.getenv("OUTPUT_TTL_SECONDS", "86400"))
     
     def package_project(self, project_spec: ProjectSpec, files: Dict[str, str]) -> str:
         """Package all generated files into a zip file"""
         
-        # Create unique project directory
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        project_dir = self.output_dir / f"{project_spec.project_name}_{timestamp}"
-        project_dir.mkdir(parents=True, exist_ok=True)
+        # Keep the output directory bounded on long-running servers
+        self._prune_expired_outputs()
         
-        # Write all files
-        for file_path, content in files.items():
-            full_path = project_dir / file_path
-            full_path.parent.mkdir(parents=True, exist_ok=True)
-            
-            with open(full_path, 'w', encoding='utf-8') as f:
-                f.write(content)
+        now = datetime.now()
+        timestamp = now.strftime("%Y%m%d_%H%M%S")
         
-        # Create zip file
+        if self.keep_project_dir:
+            project_dir = self.output_dir / f"{project_spec.project_name}_{timestamp}"
+            FileSystemUtils.write_files(project_dir, files)
+        
+        # OPTIMIZATION: Zip straight from the in-memory files - no write-then-read-back
         zip_path = self.output_dir / f"{project_spec.project_name}_{timestamp}.zip"
         
         with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            for file_path in project_dir.rglob('*'):
-                if file_path.is_file():
-                    arcname = file_path.relative_to(project_dir)
-                    zipf.write(file_path, arcname)
+            for file_path, content in files.items():
+                info = zipfile.ZipInfo(file_path, date_time=now.timetuple()[:6])
+                info.compress_type = zipfile.ZIP_DEFLATED
+                info.external_attr = 0o644 << 16  # rw-r--r-- when extracted
+                zipf.writestr(info, content.encode('utf-8'))
+        
+        return str(zip_path)
+    
+    def _prune_expired_outputs(self):
+        """Delete generated zips/directories older than the output TTL"""
+        cutoff = time.time() - self.output_ttl_seconds
         
-        return str(zip_path)
\ No newline at end of file
+        for entry in self.output_dir.iterdir():
+            try:
+                if entry.stat().st_mtime >= cutoff:
+                    continue
+                if entry.is_dir():
+                    shutil.rmtree(entry, ignore_errors=True)
+                else:
+                    entry.unlink()
+            except OSError:
+                pass  # Still in use (e.g. being downloaded) - retry next time
@@ -1,146 +1,162 @@
-from langchain_groq import ChatGroq
-from langchain_core.prompts import ChatPromptTemplate
-from typing import Dict
+from typing import Dict, Optional
+from types import MappingProxyType
+from collections import Counter
+from utils.ast_edit import parse_source, replace_nodes
+import ast
 import re
 
-class ModernizerAgent:
-    """Updates generated code to use latest library versions and patterns"""
-    
-    def __init__(self, llm: ChatGroq):
-        self.llm = llm
-        self.deprecation_patterns = self._load_deprecation_patterns()
+# Regex-based fixes for known deprecations: (pattern, replacement)
+_QUICK_FIXES = [
+    # LangChain: Old import paths
+    (r'from langchain\.llms import OpenAI', 'from langchain_openai import OpenAI'),
+    (r'from langchain\.chat_models import ChatOpenAI', 'from langchain_openai import ChatOpenAI'),
+    (r'from langchain\.embeddings import OpenAIEmbeddings', 'from langchain_openai import OpenAIEmbeddings'),
     
-    def modernize_files(self, files: Dict[str, str]) -> Dict[str, str]:
-        """Update all Python files to use modern syntax - OPTIMIZED for batch processing"""
-        
-        # OPTIMIZATION: Apply quick fixes first (no LLM calls)
-        quick_fixed = {}
-        python_files = {}
-        
-        for path, content in files.items():
-            if path.endswith('.py'):
-                fixed = self._apply_quick_fixes(content)
-                quick_fixed[path] = fixed
-                python_files[path] = fixed
-            else:
-                quick_fixed[path] = content
-        
-        # OPTIMIZATION: Single LLM call for ALL Python files instead of per-file
-        if python_files:
-            modernized_python = self._llm_modernize_batch(python_files)
-            quick_fixed.update(modernized_python)
-        
-        return quick_fixed
+    # Pydantic v2 updates
+    (r'from pydantic import BaseSettings', 'from pydantic_settings import BaseSettings'),
     
-    def _apply_quick_fixes(self, code: str) -> str:
-        """Apply regex-based fixes for known deprecations - NO LLM NEEDED"""
-        
-        fixes = [
-            # LangChain: Old import paths
-            (r'from langchain\.llms import OpenAI', 'from langchain_openai import OpenAI'),
-            (r'from langchain\.chat_models import ChatOpenAI', 'from langchain_openai import ChatOpenAI'),
-            (r'from langchain\.embeddings import OpenAIEmbeddings', 'from langchain_openai import OpenAIEmbeddings'),
-            
-            # Pydantic v2 updates
-            (r'from pydantic import BaseSettings', 'from pydantic_settings import BaseSettings'),
-            (r'class Config:', 'model_config = ConfigDict('),
-            
-            # Type hints modernization
-            (r'from typing import List\n', ''),
-            (r'from typing import Dict\n', ''),
-            (r'from typing import Tuple\n', ''),
-            (r'from typing import Set\n', ''),
-            (r': List\[', ': list['),
-            (r': Dict\[', ': dict['),
-            (r': Tuple\[', ': tuple['),
-            (r': Set\[', ': set['),
-            (r'-> List\[', '-> list['),
-            (r'-> Dict\[', '-> dict['),
-            
-            # LangChain LCEL updates
-            (r'\.run\(', '.invoke('),
-            (r'LLMChain\(', '# Updated to LCEL pattern\n'),
-        ]
-        
-        for pattern, replacement in fixes:
-            code = re.sub(pattern, replacement, code)
-        
-        return code
-    
-    def _llm_modernize_batch(self, python_files: Dict[str, str]) -> Dict[str, str]:
-        """OPTIMIZATION: Modernize ALL files in a single LLM call"""
-        
-        if not python_files:
-            return {}
-        
-        # Build prompt with all files
-        files_content = "\n\n".join([
-            f"=== FILE: {path} ===\n```python\n{code}\n```"
-            for path, code in python_files.items()
-        ])
-        
-        prompt = f"""You are a Python code modernization expert. Update ALL the following files to use latest patterns.
+    # LangChain LCEL updates
+    (r'\.run\(', '.invoke('),
+]
 
-{files_content}
+# Type hints modernization - textual fallback for files the ast rewrite can't parse
+_TYPE_HINT_FIXES = [
+    (r'from typing import List\n', ''),
+    (r'from typing import Dict\n', ''),
+    (r'from typing import Tuple\n', ''),
+    (r'from typing import Set\n', ''),
+    (r': List\[', ': list['),
+    (r': Dict\[', ': dict['),
+    (r': Tuple\[', ': tuple['),
+    (r': Set\[', ': set['),
+    (r'-> List\[', '-> list['),
+    (r'-> Dict\[', '-> dict['),
+]
 
-REQUIREMENTS:
-1. Update deprecated imports and methods
-2. Use Python 3.10+ native type hints (list[], dict[], not List[], Dict[])
-3. Use latest LangChain patterns (LCEL with | operator, .invoke() not .run())
-4. Use Pydantic v2 syntax (model_config, not class Config)
-5. Ensure async/await patterns are correct
-6. Keep all functionality identical
+# OPTIMIZATION: All fixes fused into one alternation so the code is scanned once,
+# not once per fix. Each fix gets a named group that maps back to its replacement.
+_ALL_FIXES = _QUICK_FIXES + _TYPE_HINT_FIXES
+_QUICK_FIX_RE = re.compile('|'.join(
+    f'(?P<fix{i}>{pattern})' for i, (pattern, _) in enumerate(_QUICK_FIXES)
+))
+_FALLBACK_FIX_RE = re.compile('|'.join(
+    f'(?P<fix{i}>{pattern})' for i, (pattern, _) in enumerate(_ALL_FIXES)
+))
+_QUICK_FIX_REPLACEMENTS = {
+    f'fix{i}': replacement for i, (_, replacement) in enumerate(_ALL_FIXES)
+}
 
-RESPONSE FORMAT:
-```python:filename1.py
-# modernized code
-```
+# Every quick fix needs one of these substrings (the typing rewrite needs `typing`
+# imported), so files without any are returned untouched
+_QUICK_FIX_MARKERS = ('typing', 'langchain.', 'BaseSettings', '.run(')
 
-```python:filename2.py
-# modernized code
-```
+# typing generics with a builtin equivalent (PEP 585)
+_BUILTIN_GENERICS = MappingProxyType({
+    'List': 'list',
+    'Dict': 'dict',
+    'Tuple': 'tuple',
+    'Set': 'set',
+    'FrozenSet': 'frozenset',
+    'Type': 'type',
+})
 
-Return ALL files with the SAME filenames in the format above."""
+# Common deprecation patterns - static, so shared read-only across agent instances
+_DEPRECATION_PATTERNS = MappingProxyType({
+    'langchain': {
+        'old': ['LLMChain', 'from langchain.llms', 'ChatOpenAI'],
+        'new': ['Use LCEL with |', 'from langchain_openai', 'Use invoke()']
+    },
+    'pydantic': {
+        'old': ['BaseSettings', 'class Config'],
+        'new': ['pydantic_settings.BaseSettings', 'model_config = ConfigDict']
+    }
+})
 
-        try:
-            template = ChatPromptTemplate.from_template("{prompt}")
-            chain = template | self.llm
-            response = chain.invoke({"prompt": prompt})
-            
-            # Parse response
-            modernized = self._parse_batch_response(response.content)
-            
-            # Return modernized files, fallback to original if parsing fails
-            return {path: modernized.get(path, code) for path, code in python_files.items()}
-            
-        except Exception as e:
-            print(f"Warning: Batch modernization failed: {e}")
-            return python_files  # Return originals on error
+def _modernize_type_hints(code: str) -> Optional[str]:
+    """Rewrite typing.List[...]-style hints to builtin generics and prune the typing imports
+    they leave unused. Returns None if the code doesn't parse.
     
-    def _parse_batch_response(self, content: str) -> Dict[str, str]:
-        """Parse LLM response containing multiple modernized files"""
-        files = {}
-        
-        # Pattern: ```python:filename.py ... ```
-        pattern = r'```(?:python)?:([^\n]+)\n(.*?)```'
-        matches = re.findall(pattern, content, re.DOTALL)
-        
-        for filename, code in matches:
-            filename = filename.strip()
-            code = code.strip()
-            files[filename] = code
-        
+    OPTIMIZATION: One parse + tree walk handles nested hints and imports together, and only
+    real subscript nodes are touched - names like MyList[...] and string contents are left alone.
+    """
+    tree, _ = parse_source(code)
+    if tree is None:
+        return None
+    
+    # Generic names bound by a module-level `from typing import ...`, and names bound to typing itself
+    imported: Dict[str, ast.ImportFrom] = {}
+    typing_modules = set()
+    for node in tree.body:
+        if isinstance(node, ast.ImportFrom) and node.module == 'typing' and not node.level:
+            for alias in node.names:
+                if alias.name in _BUILTIN_GENERICS and alias.asname is None:
+                    imported[alias.name] = node
+        elif isinstance(node, ast.Import):
+            for alias in node.names:
+                if alias.name == 'typing':
+                    typing_modules.add(alias.asname or 'typing')
+    
+    replacements = []
+    uses = Counter()
+    rewritten = Counter()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and node.id in imported:
+            uses[node.id] += 1
+        elif isinstance(node, ast.Subscript):
+            value = node.value
+            if isinstance(value, ast.Name) and value.id in imported:
+                replacements.append((value, _BUILTIN_GENERICS[value.id]))
+                rewritten[value.id] += 1
+            elif (isinstance(value, ast.Attribute) and value.attr in _BUILTIN_GENERICS
+                    and isinstance(value.value, ast.Name) and value.value.id in typing_modules):
+                replacements.append((value, _BUILTIN_GENERICS[value.attr]))
+    
+    if not replacements:
+        return code
+    
+    # Drop imported names whose every use was just rewritten
+    unused = {name for name in rewritten if uses[name] == rewritten[name]}
+    import_edits = []
+    for node in {id(n): n for name, n in imported.items() if name in unused}.values():
+        kept = [
+            f"{alias.name} as {alias.asname}" if alias.asname else alias.name
+            for alias in node.names if alias.name not in unused
+        ]
+        import_edits.append((node, f"from typing import {', '.join(kept)}" if kept else ""))
+    
+    # Parsing the result here also primes the cache for the verifier's syntax check
+    modern = replace_nodes(code, replacements + import_edits)
+    if parse_source(modern)[0] is None:
+        # e.g. an emptied import shared a line with another statement - keep the imports
+        modern = replace_nodes(code, replacements)
+    return modern
+
+class ModernizerAgent:
+    """Rule-based fixes for deprecated library patterns in generated code
+    
+    The generator prompt carries the modernization rules, so there is no LLM pass here -
+    these fixes are the safety net for the patterns that still slip through.
+    """
+    
+    def __init__(self):
+        self.deprecation_patterns = _DEPRECATION_PATTERNS
+    
+    def apply_quick_fixes(self, files: Dict[str, str]) -> Dict[str, str]:
+        """Rule-based pass only (no LLM) - updates and returns the given files dict in place"""
+        for path, content in files.items():
+            if path.endswith('.py'):
+                files[path] = self._apply_quick_fixes(content)
         return files
     
-    def _load_deprecation_patterns(self) -> dict:
-        """Load common deprecation patterns"""
-        return {
-            'langchain': {
-                'old': ['LLMChain', 'from langchain.llms', 'ChatOpenAI'],
-                'new': ['Use LCEL with |', 'from langchain_openai', 'Use invoke()']
-            },
-            'pydantic': {
-                'old': ['BaseSettings', 'class Config'],
-                'new': ['pydantic_settings.BaseSettings', 'model_config = ConfigDict']
-            }
-        }
\ No newline at end of file
+    def _apply_quick_fixes(self, code: str) -> str:
+        """Apply rule-based fixes for known deprecations - NO LLM NEEDED"""
+        
+        # OPTIMIZATION: C-level substring checks reject most files before any parse or regex scan
+        if not any(marker in code for marker in _QUICK_FIX_MARKERS):
+            return code
+        
+        modern = _modernize_type_hints(code)
+        if modern is None:
+            # Unparseable file - fall back to the textual type-hint rewrite
+            return _FALLBACK_FIX_RE.sub(lambda m: _QUICK_FIX_REPLACEMENTS[m.lastgroup], code)
+        return _QUICK_FIX_RE.sub(lambda m: _QUICK_FIX_REPLACEMENTS[m.lastgroup], modern)
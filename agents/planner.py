@@ -2,73 +2,226 @@ from langchain_groq import ChatGroq
 from langchain_core.prompts import ChatPromptTemplate
 from schemas.project_spec import ProjectSpec, FileSpec, DependencySpec, FileType
 from utils.json_validator import JSONValidator
+from utils.prompts import load_prompt
+from json_repair import repair_json
+from typing import Optional, Tuple
+from collections import OrderedDict
+from difflib import SequenceMatcher
+from functools import lru_cache
 import json
+import os
+import orjson
 import re
 
+# Markdown fences (```json or bare ```) stripped from LLM responses in one pass
+# before carving out the JSON
+_FENCE_RE = re.compile(r'```(?:json)?\s*')
+
+_JSON_DECODER = json.JSONDecoder()
+
+# Targeted fixes attempted before falling back to whole-string repair
+_MAX_JSON_PATCHES = 8
+_BARE_KEY_RE = re.compile(r"\s*(?:'([^'\n]*)'|([A-Za-z_]\w*))\s*:")
+_TRAILING_WS_RE = re.compile(r'\s*$')
+
+# Near-duplicate query cache: a query whose normalized word sequence matches an earlier
+# one at least PLAN_CACHE_SIMILARITY (ordered SequenceMatcher ratio; the default 1.0
+# means identical after normalization) reuses that plan instead of calling the LLM.
+# Word order counts - "convert csv to json" and "convert json to csv" never match.
+_PLAN_CACHE_SIZE = 256
+_QUERY_WORD_RE = re.compile(r'[a-z0-9+#]+(?:\.[a-z0-9]+)*')
+# Filler words that don't change what gets built ("build a todo app" == "make a todo app")
+_QUERY_STOPWORDS = frozenset({
+    'a', 'an', 'the', 'please', 'me', 'i', 'we', 'want', 'need', 'can', 'you', 'some',
+    'build', 'make', 'create', 'write', 'generate', 'develop', 'implement', 'code',
+})
+
+def _query_words(query: str) -> Tuple[str, ...]:
+    """Normalized content words of a query, in order"""
+    return tuple(w for w in _QUERY_WORD_RE.findall(query.lower()) if w not in _QUERY_STOPWORDS)
+
+def _project_name(words: Tuple[str, ...]) -> str:
+    """Project name from the first few content words of a query"""
+    return '_'.join(_NAME_WORD_RE.findall(' '.join(words))[:3]) or "generated_project"
+
+def _patch_json_error(json_str: str, error: json.JSONDecodeError) -> Optional[str]:
+    """Fix the single defect at error.pos, or return None if it isn't a known case"""
+    pos = error.pos
+    before = _TRAILING_WS_RE.sub('', json_str[:pos])
+    
+    if error.msg.startswith("Expecting ',' delimiter"):
+        return json_str[:pos] + ',' + json_str[pos:]
+    
+    if error.msg.startswith("Expecting property name"):
+        # Trailing comma before }
+        if json_str[pos:pos + 1] == '}' and before.endswith(','):
+            return before[:-1] + json_str[len(before):]
+        # Unquoted or single-quoted key
+        match = _BARE_KEY_RE.match(json_str, pos)
+        if match:
+            key = match.group(1) if match.group(1) is not None else match.group(2)
+            return json_str[:pos] + json.dumps(key) + ':' + json_str[match.end():]
+        return None
+    
+    if error.msg.startswith("Expecting value"):
+        # Trailing comma before ]
+        if json_str[pos:pos + 1] == ']' and before.endswith(','):
+            return before[:-1] + json_str[len(before):]
+        return None
+    
+    if error.msg.startswith("Unterminated string"):
+        # Close the string at the end of its line
+        line_end = json_str.find('\n', pos)
+        if line_end == -1:
+            return json_str + '"'
+        return json_str[:line_end] + '"' + json_str[line_end:]
+    
+    return None
+
+# Alphanumeric runs (unicode-aware, like str.isalnum) used to name fallback projects
+_NAME_WORD_RE = re.compile(r'[^\W_]+')
+
+# OPTIMIZATION: The fallback spec is a pure function of the query and the models are
+# frozen, so retries of the same query reuse one validated instance
+@lru_cache(maxsize=128)
+def _minimal_spec(user_query: str) -> ProjectSpec:
+    """Minimal working project spec used when planning fails"""
+    
+    # Extract key words from query to create project name (one C-level scan)
+    project_name = '_'.join(_NAME_WORD_RE.findall(user_query)[:3]).lower()
+    
+    return ProjectSpec(
+        project_name=project_name or "generated_project",
+        description=f"Project based on: {user_query}",
+        files=[
+            FileSpec(
+                path="main.py",
+                content="",
+                file_type=FileType.PYTHON,
+                description="Main entry point"
+            ),
+            FileSpec(
+                path="utils.py",
+                content="",
+                file_type=FileType.PYTHON,
+                description="Utility functions"
+            )
+        ],
+        dependencies=[
+            DependencySpec(
+                package="python-dotenv",
+                version=None,
+                purpose="Environment variable management"
+            )
+        ],
+        env_variables={
+            "API_KEY": "Your API key"
+        },
+        entry_point="main.py",
+        test_cases=["Basic functionality test"],
+        readme_content=f"# {project_name}\n\n{user_query}"
+    )
+
 class PlannerAgent:
-    def __init__(self, llm: ChatGroq):
+    def __init__(self, llm: ChatGroq, fallback_llm: Optional[ChatGroq] = None):
         self.llm = llm
-        with open("prompts/planner.txt", "r") as f:
-            self.prompt_template = f.read()
-        self.max_retries = 3
+        self.prompt_template = load_prompt("planner.txt")
+        
+        prompt = ChatPromptTemplate.from_template(self.prompt_template)
+        # OPTIMIZATION: Native tool-calling binding - the model returns arguments that
+        # are validated straight into ProjectSpec, no extraction or repair needed
+        self.structured_chain = prompt | self.llm.with_structured_output(ProjectSpec)
+        # Plain-text chain kept only as a fallback for models without tool calling -
+        # optionally on a stronger model, so the retry escalates instead of repeating
+        self.chain = prompt | (fallback_llm or self.llm)
+        # OPTIMIZATION: Recent LLM plans keyed by normalized query words - specs are
+        # frozen, so a cached plan can be handed out again as-is
+        self._plan_cache: OrderedDict[Tuple[str, ...], ProjectSpec] = OrderedDict()
+        # Read here rather than at import so a value set in .env (loaded when the
+        # workflow is built) applies
+        self.plan_cache_similarity = float(os.getenv("PLAN_CACHE_SIMILARITY", "1.0"))
     
     def plan(self, user_query: str) -> ProjectSpec:
         """Generate comprehensive project specification from user query"""
         
-        prompt = ChatPromptTemplate.from_template(self.prompt_template)
-        chain = prompt | self.llm
+        words = _query_words(user_query)
+        cached = self._cached_plan(words)
+        if cached is not None:
+            print("   ♻️  Reusing plan from a near-identical earlier query")
+            return cached
         
-        last_error = None
+        try:
+            spec = self.structured_chain.invoke({"user_query": user_query})
+            if spec is not None:
+                self._remember_plan(words, spec)
+                return spec
+            print("   ⚠️  Structured output returned nothing, falling back to raw JSON...")
+        except Exception as e:
+            print(f"   ⚠️  Structured output failed: {str(e)[:100]}")
         
-        # Try multiple times with different strategies
-        for attempt in range(self.max_retries):
-            try:
-                if attempt == 0:
-                    # First attempt: normal generation
-                    response = chain.invoke({"user_query": user_query})
-                elif attempt == 1:
-                    # Second attempt: explicitly ask for valid JSON
-                    response = chain.invoke({
-                        "user_query": f"{user_query}\n\nIMPORTANT: Return ONLY valid JSON, ensure all strings are properly quoted and all commas are in place."
-                    })
-                else:
-                    # Third attempt: use structured output with more guidance
-                    response = chain.invoke({
-                        "user_query": f"{user_query}\n\nRETURN VALID JSON ONLY. Check: all quotes match, all commas present, no trailing commas."
-                    })
-                
-                # Parse LLM response into ProjectSpec
-                spec_data = self._parse_llm_response(response.content)
-                return ProjectSpec(**spec_data)
-                
-            except json.JSONDecodeError as e:
-                last_error = e
-                print(f"   ⚠️  Attempt {attempt + 1} failed: JSON parsing error at char {e.pos}")
-                
-                # Try to fix common JSON issues and retry
-                if attempt < self.max_retries - 1:
-                    # Try to repair the JSON
-                    try:
-                        repaired = self._repair_json(response.content)
-                        spec_data = json.loads(repaired)
-                        return ProjectSpec(**spec_data)
-                    except:
-                        continue
-            
-            except Exception as e:
-                last_error = e
-                print(f"   ⚠️  Attempt {attempt + 1} failed: {str(e)[:100]}")
-        
-        # If all retries failed, return a minimal working spec
+        # Single fallback call: parse and repair raw JSON locally
+        try:
+            response = self.chain.invoke({"user_query": user_query})
+            spec_data = self._parse_llm_response(response.content)
+            spec = ProjectSpec(**spec_data)
+            self._remember_plan(words, spec)
+            return spec
+        except Exception as e:
+            print(f"   ⚠️  Raw JSON fallback failed: {str(e)[:100]}")
+        
+        # If both attempts failed, return a minimal working spec
         print("   ⚠️  All parsing attempts failed, generating minimal spec...")
         return self._create_minimal_spec(user_query)
     
+    def _remember_plan(self, words: Tuple[str, ...], spec: ProjectSpec):
+        """Store a plan, evicting the oldest once the cache is full"""
+        if not words:
+            return
+        self._plan_cache[words] = spec
+        self._plan_cache.move_to_end(words)
+        if len(self._plan_cache) > _PLAN_CACHE_SIZE:
+            self._plan_cache.popitem(last=False)
+    
+    def _cached_plan(self, words: Tuple[str, ...]) -> Optional[ProjectSpec]:
+        """Cached plan for the same query, or the most similar one at or above
+        plan_cache_similarity - renamed after this query unless the words are identical"""
+        if not words:
+            return None
+        
+        spec = self._plan_cache.get(words)
+        if spec is not None:
+            self._plan_cache.move_to_end(words)
+            return spec
+        if self.plan_cache_similarity >= 1.0:
+            return None
+        
+        best, best_score = None, self.plan_cache_similarity
+        matcher = SequenceMatcher(autojunk=False)
+        matcher.set_seq2(words)
+        for cached_words, cached_spec in list(self._plan_cache.items()):
+            matcher.set_seq1(cached_words)
+            if matcher.real_quick_ratio() < best_score or matcher.quick_ratio() < best_score:
+                continue
+            score = matcher.ratio()
+            if score >= best_score:
+                best, best_score = cached_spec, score
+        if best is None:
+            return None
+        # A different query gets its own name, not the earlier project's
+        return best.model_copy(update={"project_name": _project_name(words)})
+    
     def _parse_llm_response(self, content: str) -> dict:
         """Extract and parse JSON from LLM response"""
         
         # Extract JSON string
         json_str = self._extract_json(content)
         
+        # OPTIMIZATION: Patch only where the decoder reports the error, resuming from
+        # there, instead of running every global regex repair over the whole string
+        data = self._decode_with_patches(json_str)
+        if data is not None:
+            return data
+        
         # Use validator to parse and repair
         is_valid, data, error = JSONValidator.validate_and_repair(json_str)
         
@@ -76,125 +229,62 @@ class PlannerAgent:
             if error:
                 print(f"   ⚠️  Warning: {error}")
             return data
-        else:
+        
+        # Last resort before spending another LLM call: library repair
+        try:
+            return json.loads(self._repair_json(json_str))
+        except json.JSONDecodeError:
             raise ValueError(f"JSON validation failed: {error}")
     
+    def _decode_with_patches(self, json_str: str) -> Optional[dict]:
+        """Decode JSON, fixing errors in place at the position the decoder reports"""
+        
+        # OPTIMIZATION: orjson for the common well-formed case
+        try:
+            return orjson.loads(json_str)
+        except orjson.JSONDecodeError:
+            pass
+        
+        for _ in range(_MAX_JSON_PATCHES):
+            try:
+                data, _ = _JSON_DECODER.raw_decode(json_str)
+                return data
+            except json.JSONDecodeError as e:
+                json_str = _patch_json_error(json_str, e)
+                if json_str is None:
+                    return None
+        return None
+    
     def _extract_json(self, content: str) -> str:
         """Extract JSON from various formats"""
         
         # Remove markdown code blocks if present
-        content = re.sub(r'```json\s*', '', content)
-        content = re.sub(r'```\s*', '', content)
+        content = _FENCE_RE.sub('', content)
         
         # Find JSON object boundaries
         start = content.find("{")
         if start == -1:
             raise ValueError("No JSON object found in response")
         
-        # Find matching closing brace
-        brace_count = 0
-        end = start
-        
-        for i in range(start, len(content)):
-            if content[i] == '{':
-                brace_count += 1
-            elif content[i] == '}':
-                brace_count -= 1
-                if brace_count == 0:
-                    end = i + 1
-                    break
-        
-        if brace_count != 0:
-            # Try simple approach
-            end = content.rfind("}") + 1
-        
-        return content[start:end]
-    
-    def _clean_json_string(self, json_str: str) -> str:
-        """Clean up common JSON issues"""
-        
-        # Remove comments (// and /* */)
-        json_str = re.sub(r'//.*?$', '', json_str, flags=re.MULTILINE)
-        json_str = re.sub(r'/\*.*?\*/', '', json_str, flags=re.DOTALL)
-        
-        # Fix trailing commas in arrays and objects
-        json_str = re.sub(r',(\s*[}\]])', r'\1', json_str)
+        # OPTIMIZATION: Let the C decoder find the end of the object in one call.
+        # It also understands strings, so braces inside values can't confuse it.
+        try:
+            _, end = _JSON_DECODER.raw_decode(content, start)
+            return content[start:end]
+        except json.JSONDecodeError:
+            pass
         
-        # Fix missing commas between elements (simple heuristic)
-        json_str = re.sub(r'"\s*\n\s*"', '",\n"', json_str)
-        json_str = re.sub(r'}\s*\n\s*{', '},\n{', json_str)
-        json_str = re.sub(r']\s*\n\s*"', '],\n"', json_str)
-        
-        # Escape unescaped quotes in strings (very basic)
-        # This is risky but helps with common issues
-        
-        return json_str
+        # Malformed JSON - keep everything up to the last closing brace for the repair path
+        end = content.rfind("}") + 1
+        return content[start:end] if end > start else content[start:]
     
     def _repair_json(self, json_str: str) -> str:
         """Attempt to repair malformed JSON"""
         
-        # Use a more aggressive repair strategy
-        import re
-        
-        # Fix common issues
-        json_str = self._clean_json_string(json_str)
-        
-        # Try to add missing closing braces
-        open_braces = json_str.count('{')
-        close_braces = json_str.count('}')
-        if open_braces > close_braces:
-            json_str += '}' * (open_braces - close_braces)
-        
-        # Try to add missing closing brackets
-        open_brackets = json_str.count('[')
-        close_brackets = json_str.count(']')
-        if open_brackets > close_brackets:
-            json_str += ']' * (open_brackets - close_brackets)
-        
-        # Fix unquoted keys (basic pattern)
-        json_str = re.sub(r'(\w+)(\s*:)', r'"\1"\2', json_str)
-        
-        # Fix single quotes to double quotes
-        # Be careful with contractions
-        json_str = json_str.replace("'", '"')
-        
-        return json_str
+        # json-repair handles unquoted keys, single quotes, trailing/missing commas
+        # and unbalanced braces in one streaming pass, without mangling apostrophes
+        return repair_json(json_str)
     
     def _create_minimal_spec(self, user_query: str) -> ProjectSpec:
         """Create a minimal working project spec as fallback"""
-        
-        # Extract key words from query to create project name
-        words = user_query.lower().split()
-        project_name = '_'.join([w for w in words if w.isalnum()][:3])
-        
-        return ProjectSpec(
-            project_name=project_name or "generated_project",
-            description=f"Project based on: {user_query}",
-            files=[
-                FileSpec(
-                    path="main.py",
-                    content="",
-                    file_type=FileType.PYTHON,
-                    description="Main entry point"
-                ),
-                FileSpec(
-                    path="utils.py",
-                    content="",
-                    file_type=FileType.PYTHON,
-                    description="Utility functions"
-                )
-            ],
-            dependencies=[
-                DependencySpec(
-                    package="python-dotenv",
-                    version=None,
-                    purpose="Environment variable management"
-                )
-            ],
-            env_variables={
-                "API_KEY": "Your API key"
-            },
-            entry_point="main.py",
-            test_cases=["Basic functionality test"],
-            readme_content=f"# {project_name}\n\n{user_query}"
-        )
\ No newline at end of file
+        return _minimal_spec(user_query)
@@ -1,43 +1,104 @@
 from langchain_groq import ChatGroq
 from langchain_core.prompts import ChatPromptTemplate
-from typing import Dict, List
+from typing import Dict, List, Optional, Tuple
+from utils.async_utils import run_sync
+from utils.prompts import load_prompt
+from utils.extract import CODE_BLOCK_RE, extract_code
+from utils.ast_edit import line_offsets, node_source, parse_source, replace_nodes
+import asyncio
+import ast
+import os
 import re
+import textwrap
+
+_JSON_CALL_RE = re.compile(r'(\s*)(\w+\s*=\s*)?json\.(loads?)\((.*?)\)')
+_DICT_ACCESS_RE = re.compile(r'(\w+)\[(["\'])(\w+)\2\]')
+_DEF_LINE_RE = re.compile(r'^[ \t]*(def)\s', re.MULTILINE)
+
+_ERROR_PREFIX_RE = re.compile(r'^(?:SYNTAX ERROR in |RUNTIME ERROR: )')
+
+# Localized repairs: errors that name a line in a long file only send the
+# surrounding lines to the LLM instead of the whole file
+_ERROR_LINE_RE = re.compile(r'\bline (\d+)')
+_REPAIR_WINDOW_CONTEXT = 20
+_REPAIR_WINDOW_MIN_LINES = 120
+
+# Error keywords (all must appear) -> quick-fix method, in the order fixes are applied
+_QUICK_FIX_RULES = [
+    (('json parsing',), '_wrap_json_parsing'),
+    (('jsondecode',), '_wrap_json_parsing'),
+    (('dictionary access',), '_fix_dict_access'),
+    (('keyerror',), '_fix_dict_access'),
+    (('http request',), '_add_request_error_handling'),
+    (('requests.',), '_add_request_error_handling'),
+    (('await', 'async'), '_fix_async_await'),
+]
+
+def _awaits_directly(func: ast.FunctionDef) -> bool:
+    """True if the function body awaits outside of any nested function"""
+    stack = list(func.body)
+    while stack:
+        node = stack.pop()
+        if isinstance(node, ast.Await):
+            return True
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda, ast.ClassDef)):
+            continue
+        stack.extend(ast.iter_child_nodes(node))
+    return False
+
+def _common_indent(text: str) -> str:
+    """Leading whitespace shared by every non-blank line (what textwrap.dedent removes)"""
+    indents = [line[:len(line) - len(line.lstrip())] for line in text.split('\n') if line.strip()]
+    return os.path.commonprefix(indents) if indents else ""
 
 class RepairAgent:
     def __init__(self, llm: ChatGroq):
         self.llm = llm
-        with open("prompts/repair.txt", "r") as f:
-            self.prompt_template = f.read()
+        self.prompt_template = load_prompt("repair.txt")
+        # OPTIMIZATION: Parse the template and build the chain once, not per file
+        self.chain = ChatPromptTemplate.from_template(self.prompt_template) | self.llm
     
     def repair_files(self, files: Dict[str, str], errors: List[str]) -> Dict[str, str]:
         """Fix errors in generated code - OPTIMIZED with batch processing"""
+        return run_sync(self.arepair_files(files, errors))
+    
+    async def arepair_files(self, files: Dict[str, str], errors: List[str]) -> Dict[str, str]:
+        """Async version of repair_files - returns only the files it changed, leaving the given dict untouched"""
         
         if not errors:
-            return files
+            return {}
         
-        # OPTIMIZATION: Apply all quick fixes first (no LLM)
-        repaired_files = files.copy()
+        # OPTIMIZATION: Apply all quick fixes first (no LLM), collecting only the files
+        # they actually change instead of copying every file
         errors_by_file = self._group_errors_by_file(errors)
+        changed = {}
         
         for file_path, file_errors in errors_by_file.items():
             if file_path in files:
-                repaired_files[file_path] = self._apply_quick_fixes(files[file_path], file_errors)
+                fixed = self._apply_quick_fixes(files[file_path], file_errors)
+                if fixed != files[file_path]:
+                    changed[file_path] = fixed
         
         # Check if any errors remain that need LLM
         complex_errors = self._get_complex_errors(errors_by_file)
         
         if complex_errors:
-            # OPTIMIZATION: Single LLM call for ALL complex repairs
+            # OPTIMIZATION: Concurrent per-file LLM calls for ALL complex repairs
             print(f"   🔧 Running LLM repair for {len(complex_errors)} files...")
-            repaired_files = self._llm_batch_repair(repaired_files, complex_errors)
+            # The LLM sees the quick-fixed version of any file it repairs
+            changed.update(await self._llm_batch_repair({**files, **changed}, complex_errors))
         
-        return repaired_files
+        return changed
     
     def _group_errors_by_file(self, errors: List[str]) -> Dict[str, List[str]]:
         """Group errors by the file they belong to"""
         grouped = {}
         
         for error in errors:
+            # Verifier prefixes ("SYNTAX ERROR in x.py: ...", "RUNTIME ERROR: x.py: ...")
+            # would otherwise be taken for the file name
+            error = _ERROR_PREFIX_RE.sub('', error, count=1)
+            
             # Try to extract filename
             if ':' in error:
                 parts = error.split(':', 1)
@@ -58,25 +119,17 @@ class RepairAgent:
     def _apply_quick_fixes(self, content: str, errors: List[str]) -> str:
         """Apply automatic fixes for common issues - NO LLM"""
         
+        # OPTIMIZATION: Classify errors first, then run each fixer at most once per file
+        # instead of rescanning the whole file for every error that mentions it
+        fixers = []
         for error in errors:
             error_lower = error.lower()
-            
-            # Fix: JSON parsing without error handling
-            if 'json parsing' in error_lower or 'jsondecode' in error_lower:
-                if 'json.loads(' in content and 'try:' not in content:
-                    content = self._wrap_json_parsing(content)
-            
-            # Fix: Dictionary access without .get()
-            if 'dictionary access' in error_lower or 'keyerror' in error_lower:
-                content = self._fix_dict_access(content)
-            
-            # Fix: Missing error handling for requests
-            if 'http request' in error_lower or 'requests.' in error_lower:
-                content = self._add_request_error_handling(content)
-            
-            # Fix: await without async
-            if 'await' in error_lower and 'async' in error_lower:
-                content = self._fix_async_await(content)
+            for keywords, fixer in _QUICK_FIX_RULES:
+                if fixer not in fixers and all(kw in error_lower for kw in keywords):
+                    fixers.append(fixer)
+        
+        for fixer in fixers:
+            content = getattr(self, fixer)(content)
         
         return content
     
@@ -91,75 +144,87 @@ class RepairAgent:
         
         return complex
     
-    def _llm_batch_repair(self, files: Dict[str, str], errors_by_file: Dict[str, List[str]]) -> Dict[str, str]:
-        """OPTIMIZATION: Repair ALL files with errors in a single LLM call"""
+    async def _llm_batch_repair(self, files: Dict[str, str], errors_by_file: Dict[str, List[str]]) -> Dict[str, str]:
+        """OPTIMIZATION: Repair every file with errors via concurrent per-file LLM calls - returns the repaired files"""
         
-        # Build prompt with all files and their errors
-        files_and_errors = []
-        for file_path, file_errors in errors_by_file.items():
-            if file_path in files:
-                errors_text = '\n'.join([f"  - {e}" for e in file_errors])
-                files_and_errors.append(
-                    f"=== FILE: {file_path} ===\n"
-                    f"ERRORS:\n{errors_text}\n\n"
-                    f"CODE:\n```python\n{files[file_path]}\n```"
-                )
+        targets = {
+            file_path: file_errors
+            for file_path, file_errors in errors_by_file.items()
+            if file_path in files
+        }
         
-        combined_context = "\n\n".join(files_and_errors)
+        if not targets:
+            return {}
         
-        prompt = f"""You are a Python debugging expert. Fix ALL the errors in these files.
-
-{combined_context}
-
-INSTRUCTIONS:
-1. Fix each error mentioned
-2. Maintain all functionality
-3. Add proper error handling where needed
-4. Keep code structure intact
-
-RESPONSE FORMAT:
-```python:filename1.py
-# fixed code
-```
-
-```python:filename2.py
-# fixed code
-```
-
-Return ALL files that needed fixes in the format above."""
-
-        try:
-            template = ChatPromptTemplate.from_template("{prompt}")
-            chain = template | self.llm
-            response = chain.invoke({"prompt": prompt})
-            
-            # Parse response
-            fixed_files = self._parse_batch_response(response.content)
-            
-            # Merge fixed files back
-            result = files.copy()
-            result.update(fixed_files)
-            return result
-            
-        except Exception as e:
-            print(f"Warning: Batch repair failed: {e}")
-            return files
+        fixed_files = await self._repair_files_concurrently(files, targets)
+        
+        # Failed repairs come back empty - keep only the files that were fixed
+        return {path: code for path, code in fixed_files if code}
     
-    def _parse_batch_response(self, content: str) -> Dict[str, str]:
-        """Parse LLM response containing multiple fixed files"""
-        files = {}
+    def _error_window(self, file_errors: List[str], line_count: int) -> Optional[Tuple[int, int]]:
+        """0-based [start, end) line range covering every error, or None to send the whole file"""
+        if line_count < _REPAIR_WINDOW_MIN_LINES:
+            return None
         
-        pattern = r'```(?:python)?:([^\n]+)\n(.*?)```'
-        matches = re.findall(pattern, content, re.DOTALL)
+        line_numbers = []
+        for error in file_errors:
+            match = _ERROR_LINE_RE.search(error)
+            if not match:
+                return None  # Some error isn't localized - the model needs the full file
+            line_numbers.append(int(match.group(1)))
         
-        for filename, code in matches:
-            files[filename.strip()] = code.strip()
+        start = max(0, min(line_numbers) - 1 - _REPAIR_WINDOW_CONTEXT)
+        end = min(line_count, max(line_numbers) + _REPAIR_WINDOW_CONTEXT)
+        if end - start > line_count // 2:
+            return None
+        return start, end
+    
+    async def _repair_files_concurrently(self, files: Dict[str, str], targets: Dict[str, List[str]]) -> List[Tuple[str, str]]:
+        """Fan out one repair prompt per file and gather the results"""
+        return await asyncio.gather(*[
+            self._llm_repair_file(file_path, files[file_path], file_errors)
+            for file_path, file_errors in targets.items()
+        ])
+    
+    async def _llm_repair_file(self, file_path: str, code: str, file_errors: List[str]) -> Tuple[str, str]:
+        """Repair a single file - returns empty code on failure so the original is kept"""
         
-        return files
+        error_message = '\n'.join([f"- {e}" for e in file_errors])
+        
+        try:
+            # OPTIMIZATION: For long files with localized errors, send only the lines
+            # around the fault and splice the fix back in
+            lines = code.split('\n')
+            window = self._error_window(file_errors, len(lines))
+            if window:
+                start, end = window
+                excerpt = '\n'.join(lines[start:end])
+                response = await self.chain.ainvoke({
+                    "file_path": f"{file_path} (excerpt, lines {start + 1}-{end}; return only the fixed excerpt)",
+                    "original_code": textwrap.dedent(excerpt),
+                    "error_message": error_message
+                })
+                match = CODE_BLOCK_RE.search(response.content)
+                if not match:
+                    return file_path, ""
+                fixed = textwrap.indent(match.group(1).strip('\n'), _common_indent(excerpt))
+                return file_path, '\n'.join(lines[:start] + [fixed] + lines[end:])
+            
+            response = await self.chain.ainvoke({
+                "file_path": file_path,
+                "original_code": code,
+                "error_message": error_message
+            })
+            return file_path, extract_code(response.content)
+            
+        except Exception as e:
+            print(f"Warning: Repair failed for {file_path}: {e}")
+            return file_path, ""
     
     def _wrap_json_parsing(self, content: str) -> str:
         """Wrap JSON parsing with proper error handling"""
-        pattern = r'(\s*)(\w+\s*=\s*)?json\.(loads?)\((.*?)\)'
+        if 'json.loads(' not in content or 'try:' in content:
+            return content
         
         def replace_json(match):
             indent = match.group(1)
@@ -174,18 +239,29 @@ Return ALL files that needed fixes in the format above."""
 {indent}    print(f"JSON parsing error: {{e}}")
 {indent}    {var_name} = {{}}"""
         
-        return re.sub(pattern, replace_json, content)
+        return _JSON_CALL_RE.sub(replace_json, content)
     
     def _fix_dict_access(self, content: str) -> str:
-        """Replace dict['key'] with dict.get('key')"""
-        pattern = r'(\w+)\[(["\'])(\w+)\2\]'
+        """Replace dict['key'] reads with dict.get('key')"""
+        tree, _ = parse_source(content)
+        if tree is None:
+            # Unparseable file - fall back to the textual rewrite
+            return _DICT_ACCESS_RE.sub(lambda m: f"{m.group(1)}.get('{m.group(3)}')", content)
         
-        def replace_dict(match):
-            var = match.group(1)
-            key = match.group(3)
-            return f"{var}.get('{key}')"
+        # OPTIMIZATION: One parse + tree walk; only string-keyed reads on plain names are
+        # rewritten, so assignments like d['k'] = v are left intact
+        source = content.encode('utf-8')
+        offsets = line_offsets(source)
+        replacements = []
+        for node in ast.walk(tree):
+            if (isinstance(node, ast.Subscript) and isinstance(node.ctx, ast.Load)
+                    and isinstance(node.value, ast.Name)
+                    and isinstance(node.slice, ast.Constant)
+                    and isinstance(node.slice.value, str)):
+                key = node_source(source, offsets, node.slice)
+                replacements.append((node, f"{node.value.id}.get({key})"))
         
-        return re.sub(pattern, replace_dict, content)
+        return replace_nodes(content, replacements)
     
     def _add_request_error_handling(self, content: str) -> str:
         """Add error handling around requests calls"""
@@ -201,17 +277,34 @@ Return ALL files that needed fixes in the format above."""
         return content
     
     def _fix_async_await(self, content: str) -> str:
-        """Fix async/await issues"""
-        lines = content.split('\n')
-        for i, line in enumerate(lines):
-            if 'def ' in line and 'async def' not in line:
-                # Check if any line below has await
-                for j in range(i+1, min(i+20, len(lines))):
-                    if 'await ' in lines[j]:
-                        lines[i] = line.replace('def ', 'async def ')
-                        break
-        
-        return '\n'.join(lines)
+        """Fix async/await issues by making functions that use await async"""
+        tree, _ = parse_source(content)
+        if tree is None:
+            return self._fix_async_await_by_lines(content)
+        
+        replacements = [
+            (node, "async def")
+            for node in ast.walk(tree)
+            if isinstance(node, ast.FunctionDef) and _awaits_directly(node)
+        ]
+        return replace_nodes(content, replacements, keyword_only=True)
+    
+    def _fix_async_await_by_lines(self, content: str) -> str:
+        """Textual fallback for files that don't parse"""
+        
+        # OPTIMIZATION: Locate each 'def' with one regex scan and search only the text up
+        # to the next 'def' for an await, then rebuild the string once
+        starts = [m.start(1) for m in _DEF_LINE_RE.finditer(content)]
+        pieces = []
+        prev = 0
+        for i, start in enumerate(starts):
+            body_end = starts[i + 1] if i + 1 < len(starts) else len(content)
+            if content.find('await ', start, body_end) != -1:
+                pieces.append(content[prev:start])
+                pieces.append('async ')
+                prev = start
+        pieces.append(content[prev:])
+        return ''.join(pieces)
     
     def _is_complex_error(self, error: str) -> bool:
         """Check if error requires LLM intervention"""
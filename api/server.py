@@ -1,6 +1,8 @@
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import FileResponse
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import FileResponse, Response
 from pydantic import BaseModel
+from contextlib import asynccontextmanager
+import asyncio
 import sys
 import os
 from pathlib import Path
@@ -11,7 +13,32 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 from graph.build_graph import create_workflow
 from schemas.project_spec import AgentState
 
-app = FastAPI(title="Text-to-Code Generator")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """OPTIMIZATION: Build the LLM client, agents and compiled graph once per worker at
+    startup, not per request or at import. Agents hold no per-job state (it all lives on
+    AgentState), so jobs can share it."""
+    app.state.workflow = create_workflow()
+    yield
+
+app = FastAPI(title="Text-to-Code Generator", lifespan=lifespan)
+
+# Bounded concurrency: GEN_WORKERS jobs run at once, up to GEN_QUEUE_DEPTH more wait
+# for a slot, and anything beyond that is rejected with 429 instead of piling up
+GEN_WORKERS = int(os.getenv("GEN_WORKERS", "4"))
+GEN_QUEUE_DEPTH = int(os.getenv("GEN_QUEUE_DEPTH", "8"))
+_generation_slots = asyncio.Semaphore(GEN_WORKERS)
+_pending_jobs = 0
+
+# ZIP delivery: read buffer size, or an nginx internal location that serves ./output
+# (X-Accel-Redirect) so the worker doesn't pump the bytes itself
+ZIP_CHUNK_SIZE = int(os.getenv("ZIP_CHUNK_SIZE", str(1 << 20)))
+ACCEL_REDIRECT_PREFIX = os.getenv("ACCEL_REDIRECT_PREFIX")
+
+class ZipFileResponse(FileResponse):
+    """OPTIMIZATION: FileResponse (Content-Length, sendfile where the server supports it)
+    with a larger read buffer than Starlette's 64 KiB default"""
+    chunk_size = ZIP_CHUNK_SIZE
 
 class GenerateRequest(BaseModel):
     query: str
@@ -22,31 +49,37 @@ async def root():
     return {"status": "online", "message": "Text-to-Code Generator API"}
 
 @app.post("/generate")
-async def generate_code(request: GenerateRequest):
+async def generate_code(request: GenerateRequest, http_request: Request):
     """
     Generate code and return ZIP file directly
     
     This is a synchronous endpoint - it will take 30s-2min to respond
     """
     
+    global _pending_jobs
+    
     if not request.query or not request.query.strip():
         raise HTTPException(status_code=400, detail="Query cannot be empty")
     
+    if _pending_jobs >= GEN_WORKERS + GEN_QUEUE_DEPTH:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many generation jobs in progress, please retry later"
+        )
+    
+    _pending_jobs += 1
     try:
         print(f"\n{'='*60}")
         print(f"📝 Received query: {request.query}")
         print(f"{'='*60}")
         
-        # Create workflow
-        print("⚙️  Creating workflow...")
-        workflow = create_workflow()
-        
         # Create initial state
         initial_state = AgentState(user_query=request.query)
         
-        # Run workflow (this blocks until complete)
+        # Run workflow without blocking the event loop (sync nodes run in worker threads)
         print("🔄 Running workflow...")
-        final_state = workflow.invoke(initial_state)
+        async with _generation_slots:
+            final_state = await http_request.app.state.workflow.ainvoke(initial_state)
         
         # Get the zip file path
         zip_path = final_state.get('final_zip_path')
@@ -64,7 +97,16 @@ async def generate_code(request: GenerateRequest):
         # Return the zip file
         filename = os.path.basename(zip_path)
         
-        return FileResponse(
+        if ACCEL_REDIRECT_PREFIX:
+            return Response(
+                media_type='application/zip',
+                headers={
+                    'X-Accel-Redirect': f"{ACCEL_REDIRECT_PREFIX.rstrip('/')}/{filename}",
+                    'Content-Disposition': f'attachment; filename="{filename}"'
+                }
+            )
+        
+        return ZipFileResponse(
             path=zip_path,
             media_type='application/zip',
             filename=filename
@@ -80,6 +122,9 @@ async def generate_code(request: GenerateRequest):
             status_code=500,
             detail=f"Generation failed: {str(e)}"
         )
+    
+    finally:
+        _pending_jobs -= 1
 
 if __name__ == "__main__":
     import uvicorn
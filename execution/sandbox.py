@@ -2,106 +2,136 @@ import subprocess
 import tempfile
 import os
 from pathlib import Path
-from typing import Dict, Tuple, List
+from typing import Dict, Tuple, List, Optional, Union
+from utils.fs import FileSystemUtils
 import sys
 import ast
 import json
 import time
 import shutil
+import hashlib
+import atexit
+
+# OPTIMIZATION: Installed dependency sets are cached on disk, one directory per
+# requirements.txt hash, so pip only runs the first time a set is seen (across
+# repair iterations, projects and server restarts) and never touches this interpreter
+# An empty value (e.g. copied from .env.example) falls back to the default as well -
+# Path('') would be the working directory
+SANDBOX_CACHE_DIR = Path(
+    os.getenv("SANDBOX_CACHE_DIR") or str(Path.home() / ".cache" / "sandbox_venvs")
+)
+
+# OPTIMIZATION: Compile results per file content - on repair iterations only files the
+# repair actually changed are compiled again
+_COMPILE_CACHE: Dict[bytes, Tuple[bool, str]] = {}
+_COMPILE_CACHE_MAX = 512
+
+def _site_packages_dir(requirements: str) -> Path:
+    """Cache directory the given requirements.txt installs into"""
+    digest = hashlib.sha256(requirements.encode('utf-8')).hexdigest()
+    return SANDBOX_CACHE_DIR / digest / 'site-packages'
 
 class SandboxRunner:
     def __init__(self, timeout: int = 30):
         self.timeout = timeout
+        # OPTIMIZATION: One base directory per runner; each dry run works in a fresh
+        # subdirectory that is removed best-effort, and whatever is still locked
+        # (Windows) is reaped with the base at exit instead of retried with sleeps
+        self._base_dir = Path(tempfile.mkdtemp(prefix='sandbox_'))
+        atexit.register(shutil.rmtree, self._base_dir, ignore_errors=True)
     
-    def test_execution(self, files: Dict[str, str]) -> Tuple[bool, List[str]]:
-        """Test code execution in isolated environment"""
+    def test_execution(self, files: Dict[str, str], parsed: Optional[Dict[str, ast.AST]] = None) -> Tuple[bool, List[str]]:
+        """Test code execution in isolated environment
+        
+        parsed optionally maps paths to already-parsed ASTs, which are compiled
+        directly instead of re-parsing the source.
+        """
+        parsed = parsed or {}
         
         errors = []
-        temp_dir = None
+        
+        # Only dependency installation needs files on disk
+        requirements = files.get('requirements.txt')
+        if requirements is not None and not _site_packages_dir(requirements).is_dir():
+            errors.extend(self._install_requirements(requirements))
+        
+        # OPTIMIZATION: Compile straight from the in-memory files - no temp
+        # directory, mkdirs or file writes just to read the code back
+        for file_path, content in files.items():
+            if file_path.endswith('.py'):
+                key = hashlib.blake2b(content.encode('utf-8'), digest_size=16).digest()
+                result = _COMPILE_CACHE.get(key)
+                if result is None:
+                    result = self._test_source(file_path, parsed.get(file_path, content))
+                    if len(_COMPILE_CACHE) >= _COMPILE_CACHE_MAX:
+                        _COMPILE_CACHE.clear()
+                    _COMPILE_CACHE[key] = result
+                success, error = result
+                if not success:
+                    errors.append(f"{Path(file_path).name}: {error}")
+        
+        return len(errors) == 0, errors
+    
+    def _install_requirements(self, requirements: str) -> List[str]:
+        """Install dependencies into the requirements-hash cache directory"""
+        
+        errors = []
+        staging_dir = None
         
         try:
-            # Create temporary directory
-            temp_dir = tempfile.mkdtemp()
-            temp_path = Path(temp_dir)
+            # Install into a private staging directory and move it into place only on
+            # success, so concurrent runs never see (or reuse) a half-installed set
+            SANDBOX_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            staging_dir = tempfile.mkdtemp(dir=SANDBOX_CACHE_DIR)
+            staging_path = Path(staging_dir)
+            req_path = staging_path / 'requirements.txt'
+            with open(req_path, 'w', encoding='utf-8') as f:
+                f.write(requirements)
             
-            # Write all Python files
-            python_files = []
-            for file_path, content in files.items():
-                if file_path.endswith('.py'):
-                    full_path = temp_path / file_path
-                    full_path.parent.mkdir(parents=True, exist_ok=True)
-                    
-                    # Write and immediately close
-                    with open(full_path, 'w', encoding='utf-8') as f:
-                        f.write(content)
-                    
-                    python_files.append(full_path)
-            
-            # Also write requirements.txt if exists
-            if 'requirements.txt' in files:
-                req_path = temp_path / 'requirements.txt'
-                with open(req_path, 'w', encoding='utf-8') as f:
-                    f.write(files['requirements.txt'])
-                
-                # Try to install dependencies (with timeout)
-                try:
-                    result = subprocess.run(
-                        [sys.executable, '-m', 'pip', 'install', '-r', str(req_path), '--quiet'],
-                        cwd=temp_path,
-                        capture_output=True,
-                        text=True,
-                        timeout=60
-                    )
-                    if result.returncode != 0:
-                        errors.append(f"Dependency installation failed: {result.stderr[:200]}")
-                except subprocess.TimeoutExpired:
-                    errors.append("Dependency installation timeout")
-                except Exception as e:
-                    errors.append(f"Could not install dependencies: {e}")
-            
-            # Test each Python file
-            for py_file in python_files:
-                success, error = self._test_file(py_file, temp_path)
-                if not success:
-                    errors.append(f"{py_file.name}: {error}")
+            # Try to install dependencies (with timeout)
+            try:
+                result = subprocess.run(
+                    [sys.executable, '-m', 'pip', 'install', '-r', str(req_path),
+                     '--target', str(staging_path / 'site-packages'), '--quiet'],
+                    cwd=staging_path,
+                    capture_output=True,
+                    text=True,
+                    timeout=60
+                )
+                if result.returncode != 0:
+                    errors.append(f"Dependency installation failed: {result.stderr[:200]}")
+                else:
+                    try:
+                        os.rename(staging_dir, _site_packages_dir(requirements).parent)
+                        staging_dir = None
+                    except OSError:
+                        pass  # Another run installed the same set first
+            except subprocess.TimeoutExpired:
+                errors.append("Dependency installation timeout")
+            except Exception as e:
+                errors.append(f"Could not install dependencies: {e}")
         
         except Exception as e:
             errors.append(f"Sandbox error: {str(e)}")
         
         finally:
             # Cleanup with retry logic for Windows
-            if temp_dir:
-                self._cleanup_directory(temp_dir)
+            if staging_dir:
+                self._cleanup_directory(staging_dir)
         
-        return len(errors) == 0, errors
+        return errors
     
-    def _test_file(self, file_path: Path, working_dir: Path) -> Tuple[bool, str]:
-        """Test a single Python file"""
+    def _test_source(self, file_path: str, code: Union[str, ast.AST]) -> Tuple[bool, str]:
+        """Test a single Python file (source text or a parsed AST)"""
         
         try:
-            # First check syntax
-            with open(file_path, 'r', encoding='utf-8') as f:
-                code = f.read()
-                ast.parse(code)
-            
-            # Try to import/compile (doesn't execute main code)
-            result = subprocess.run(
-                [sys.executable, '-m', 'py_compile', str(file_path)],
-                cwd=working_dir,
-                capture_output=True,
-                text=True,
-                timeout=self.timeout
-            )
-            
-            if result.returncode != 0:
-                return False, result.stderr
-            
+            # OPTIMIZATION: Byte-compile in-process - same checks as py_compile
+            # (nothing is executed) without starting a new interpreter per file
+            compile(code, file_path, 'exec')
             return True, ""
             
         except SyntaxError as e:
             return False, f"Syntax error at line {e.lineno}: {e.msg}"
-        except subprocess.TimeoutExpired:
-            return False, "Execution timeout"
         except Exception as e:
             return False, str(e)
     
@@ -110,12 +140,15 @@ class SandboxRunner:
         
         for attempt in range(max_retries):
             try:
-                # Force garbage collection to close any file handles
-                import gc
-                gc.collect()
-                
-                # Wait a bit for processes to release files
-                time.sleep(0.1 * (attempt + 1))
+                # OPTIMIZATION: First attempt goes straight to rmtree - GC and the
+                # wait are only paid once a removal has actually failed
+                if attempt > 0:
+                    # Force garbage collection to close any file handles
+                    import gc
+                    gc.collect()
+                    
+                    # Wait a bit for processes to release files
+                    time.sleep(0.1 * attempt)
                 
                 # Try to remove with error handling
                 if os.path.exists(directory):
@@ -142,7 +175,6 @@ class SandboxRunner:
                     # Last attempt failed, just ignore
                     print(f"   ⚠️  Warning: Could not clean up temp directory {directory}")
                     # Schedule for cleanup on exit
-                    import atexit
                     atexit.register(lambda: shutil.rmtree(directory, ignore_errors=True))
                     return
             except Exception as e:
@@ -156,18 +188,13 @@ class SandboxRunner:
         This catches runtime errors like JSON parsing, missing keys, etc.
         """
         
-        temp_dir = None
+        temp_path = None
         
         try:
-            temp_dir = tempfile.mkdtemp()
-            temp_path = Path(temp_dir)
+            temp_path = Path(tempfile.mkdtemp(dir=self._base_dir))
             
             # Write all files
-            for file_path, content in files.items():
-                full_path = temp_path / file_path
-                full_path.parent.mkdir(parents=True, exist_ok=True)
-                with open(full_path, 'w', encoding='utf-8') as f:
-                    f.write(content)
+            FileSystemUtils.write_files(temp_path, files)
             
             # Create a test runner script
             test_script = f"""
@@ -203,11 +230,20 @@ print("DRY_RUN_SUCCESS")
             with open(test_script_path, 'w', encoding='utf-8') as f:
                 f.write(test_script)
             
-            # Run the test script
+            # Run the test script against the cached dependency set, if installed
+            env = None
+            requirements = files.get('requirements.txt')
+            if requirements is not None and _site_packages_dir(requirements).is_dir():
+                env = dict(os.environ)
+                env['PYTHONPATH'] = os.pathsep.join(
+                    filter(None, [str(_site_packages_dir(requirements)), env.get('PYTHONPATH')])
+                )
+            
             try:
                 result = subprocess.run(
                     [sys.executable, str(test_script_path)],
                     cwd=temp_path,
+                    env=env,
                     capture_output=True,
                     text=True,
                     timeout=10
@@ -233,5 +269,5 @@ print("DRY_RUN_SUCCESS")
                 return {'success': False, 'error': str(e)}
         
         finally:
-            if temp_dir:
-                self._cleanup_directory(temp_dir)
\ No newline at end of file
+            if temp_path:
+                shutil.rmtree(temp_path, ignore_errors=True)
\ No newline at end of file
@@ -1,5 +1,7 @@
 from langgraph.graph import StateGraph, END
 from langchain_groq import ChatGroq
+from langchain_core.caches import InMemoryCache
+from langchain_core.globals import set_llm_cache
 from schemas.project_spec import AgentState
 from agents.planner import PlannerAgent
 from agents.generator import GeneratorAgent
@@ -8,85 +10,129 @@ from agents.repair import RepairAgent
 from agents.modernizer import ModernizerAgent
 from agents.integrator import IntegratorAgent
 from dotenv import load_dotenv
+import os
 
 load_dotenv()
 
+def _configure_llm_cache():
+    """OPTIMIZATION: Opt-in process-wide LLM response cache - identical prompts (e.g. a
+    resubmitted query) are answered without a network call.
+    
+    Off by default, since a cached reply to a repair prompt would replay the same broken
+    output. Set LLM_CACHE_SIZE to keep that many responses in memory (oldest evicted
+    first), or LLM_CACHE_PATH to persist the cache in SQLite across runs.
+    """
+    cache_path = os.getenv("LLM_CACHE_PATH")
+    if cache_path:
+        try:
+            from langchain_community.cache import SQLiteCache
+            set_llm_cache(SQLiteCache(database_path=cache_path))
+            return
+        except ImportError:
+            print("Warning: langchain-community not installed, ignoring LLM_CACHE_PATH")
+    cache_size = int(os.getenv("LLM_CACHE_SIZE", "0"))
+    if cache_size > 0:
+        set_llm_cache(InMemoryCache(maxsize=cache_size))
+
+# Model routing: LLM_MODEL is the default for every agent, <AGENT>_MODEL overrides it
+# per agent (e.g. a smaller model for REPAIR_MODEL), and PLANNER_FALLBACK_MODEL is
+# what the planner escalates to when structured output fails
+DEFAULT_MODEL = os.getenv("LLM_MODEL", "llama-3.3-70b-versatile")
+
 def create_workflow():
     """Build the multi-agent LangGraph workflow"""
     
-    llm = ChatGroq(model="llama-3.3-70b-versatile")
+    _configure_llm_cache()
+    
+    # Agents configured with the same model share one client
+    clients = {}
+    
+    def llm_for(env_var: str, default: str = DEFAULT_MODEL) -> ChatGroq:
+        model = os.getenv(env_var) or default
+        if model not in clients:
+            clients[model] = ChatGroq(model=model)
+        return clients[model]
     
-    planner = PlannerAgent(llm)
-    generator = GeneratorAgent(llm)
-    verifier = VerifierAgent(llm)
-    repair = RepairAgent(llm)
-    modernizer = ModernizerAgent(llm)
+    planner_model = os.getenv("PLANNER_MODEL") or DEFAULT_MODEL
+    planner = PlannerAgent(
+        llm_for("PLANNER_MODEL"),
+        fallback_llm=llm_for("PLANNER_FALLBACK_MODEL", planner_model)
+    )
+    generator = GeneratorAgent(llm_for("GENERATOR_MODEL"))
+    verifier = VerifierAgent(llm_for("VERIFIER_MODEL"))
+    repair = RepairAgent(llm_for("REPAIR_MODEL"))
+    modernizer = ModernizerAgent()
     integrator = IntegratorAgent()
     
     workflow = StateGraph(AgentState)
     
-    # Define nodes
-    def plan_node(state: AgentState) -> AgentState:
+    # Define nodes - each returns only the state fields it updates
+    def plan_node(state: AgentState) -> dict:
         print("📋 Planning project structure...")
-        project_spec = planner.plan(state.user_query)
-        state.project_spec = project_spec
-        return state
+        return {"project_spec": planner.plan(state.user_query)}
     
-    def generate_node(state: AgentState) -> AgentState:
+    def generate_code_node(state: AgentState) -> dict:
         print("🔨 Generating code files...")
-        files = generator.generate_files(state.project_spec)
-        state.generated_files = files
-        return state
+        files = generator.generate_code_files(state.project_spec)
+        # OPTIMIZATION: The generator prompt carries the modernization rules, so there is
+        # no separate LLM modernize pass - only the rule-based fixes run, as a safety net
+        return {"generated_files": modernizer.apply_quick_fixes(files)}
     
-    def modernize_node(state: AgentState) -> AgentState:
-        print("🔄 Modernizing code to latest patterns...")
-        modern_files = modernizer.modernize_files(state.generated_files)
-        state.generated_files = modern_files
-        return state
+    def generate_support_node(state: AgentState) -> dict:
+        print("📄 Generating requirements, README and env template...")
+        return {"generated_files": generator.generate_support_files(state.project_spec)}
     
-    def verify_node(state: AgentState) -> AgentState:
+    def verify_node(state: AgentState) -> dict:
         print("✅ Verifying code quality...")
         results, errors = verifier.verify_files(state.generated_files)
-        state.verification_results = results
-        state.errors = errors
-        return state
+        return {"verification_results": results, "errors": errors}
     
-    def repair_node(state: AgentState) -> AgentState:
+    def repair_node(state: AgentState) -> dict:
         print(f"🔧 Repairing errors (attempt {state.iteration_count + 1})...")
+        # Repair returns only the files it changed - merge_files folds them into generated_files
         fixed_files = repair.repair_files(state.generated_files, state.errors)
-        state.generated_files = fixed_files
-        state.iteration_count += 1
-        state.errors = []
-        return state
+        update = {
+            "iteration_count": state.iteration_count + 1,
+            "previous_errors": state.errors,
+            "errors": []
+        }
+        if fixed_files:
+            update["generated_files"] = fixed_files
+        return update
     
-    def integrate_node(state: AgentState) -> AgentState:
+    def integrate_node(state: AgentState) -> dict:
         print("📦 Packaging project...")
         zip_path = integrator.package_project(
             state.project_spec,
             state.generated_files
         )
-        state.final_zip_path = zip_path
-        return state
+        return {"final_zip_path": zip_path}
     
     def should_repair(state: AgentState) -> str:
         """Decide whether to repair or proceed"""
+        if state.errors and set(state.errors) == set(state.previous_errors):
+            # Last repair didn't change the outcome - another round won't either
+            print("   ⚠️  Same errors as the previous iteration, stopping repair loop")
+            return "integrate"
         if state.errors and state.iteration_count < state.max_iterations:
             return "repair"
         return "integrate"
     
     # Add nodes
     workflow.add_node("plan", plan_node)
-    workflow.add_node("generate", generate_node)
-    workflow.add_node("modernize", modernize_node)
+    workflow.add_node("generate_code", generate_code_node)
+    workflow.add_node("generate_support", generate_support_node)
     workflow.add_node("verify", verify_node)
     workflow.add_node("repair", repair_node)
     workflow.add_node("integrate", integrate_node)
     
     # Add edges
     workflow.set_entry_point("plan")
-    workflow.add_edge("plan", "generate")
-    workflow.add_edge("generate", "modernize")
-    workflow.add_edge("modernize", "verify")
+    # OPTIMIZATION: Code and support files are generated in parallel branches (the
+    # generated_files reducer merges them); verify waits for both
+    workflow.add_edge("plan", "generate_code")
+    workflow.add_edge("plan", "generate_support")
+    workflow.add_edge(["generate_code", "generate_support"], "verify")
     workflow.add_conditional_edges("verify", should_repair, {
         "repair": "repair",
         "integrate": "integrate"
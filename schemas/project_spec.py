@@ -1,5 +1,5 @@
-from pydantic import BaseModel, Field
-from typing import List, Dict, Optional
+from pydantic import BaseModel, ConfigDict, Field
+from typing import Annotated, List, Dict, Optional
 from enum import Enum
 
 class FileType(str, Enum):
@@ -17,17 +17,23 @@ class FileType(str, Enum):
     JAVASCRIPT = "javascript"
 
 class FileSpec(BaseModel):
+    model_config = ConfigDict(frozen=True)
+    
     path: str
     content: str = ""
     file_type: FileType
     description: str
 
 class DependencySpec(BaseModel):
+    model_config = ConfigDict(frozen=True)
+    
     package: str
     version: Optional[str] = None
     purpose: str
 
 class ProjectSpec(BaseModel):
+    model_config = ConfigDict(frozen=True)
+    
     project_name: str
     description: str
     files: List[FileSpec] = Field(default_factory=list)
@@ -37,12 +43,22 @@ class ProjectSpec(BaseModel):
     test_cases: List[str] = Field(default_factory=list)
     readme_content: str = ""
     
+def merge_files(left: Dict[str, str], right: Dict[str, str]) -> Dict[str, str]:
+    """Reducer for generated_files - parallel graph branches each contribute files, and
+    repair contributes only the files it changed"""
+    return {**left, **right}
+
 class AgentState(BaseModel):
+    # OPTIMIZATION: Immutable - graph nodes return only the fields they change, so
+    # LangGraph doesn't write every field (including all generated files) back each hop
+    model_config = ConfigDict(frozen=True)
+    
     user_query: str
     project_spec: Optional[ProjectSpec] = None
-    generated_files: Dict[str, str] = Field(default_factory=dict)
+    generated_files: Annotated[Dict[str, str], merge_files] = Field(default_factory=dict)
     verification_results: Dict[str, bool] = Field(default_factory=dict)
     errors: List[str] = Field(default_factory=list)
+    previous_errors: List[str] = Field(default_factory=list)
     iteration_count: int = 0
     max_iterations: int = 3
     final_zip_path: Optional[str] = None
\ No newline at end of file
@@ -2,10 +2,11 @@ import streamlit as st
 from pathlib import Path
 import os
 import zipfile
+from collections import deque
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-
-from graph.build_graph import create_workflow
-from schemas.project_spec import AgentState
+from dotenv import load_dotenv
 
 # Page config
 st.set_page_config(
@@ -15,7 +16,8 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Custom CSS
+# Custom CSS - colors come from the theme in .streamlit/config.toml, only the header
+# styling theming can't express is injected here
 st.markdown("""
 <style>
     .main-header {
@@ -32,33 +34,144 @@ st.markdown("""
         color: #666;
         margin-bottom: 2rem;
     }
-    .success-box {
-        padding: 1rem;
-        border-radius: 0.5rem;
-        background-color: #d4edda;
-        border: 1px solid #c3e6cb;
-        color: #155724;
-    }
-    .error-box {
-        padding: 1rem;
-        border-radius: 0.5rem;
-        background-color: #f8d7da;
-        border: 1px solid #f5c6cb;
-        color: #721c24;
-    }
-    .info-box {
-        padding: 1rem;
-        border-radius: 0.5rem;
-        background-color: #d1ecf1;
-        border: 1px solid #bee5eb;
-        color: #0c5460;
-    }
-    .stProgress > div > div > div > div {
-        background: linear-gradient(90deg, #667eea 0%, #764ba2 100%);
-    }
 </style>
 """, unsafe_allow_html=True)
 
+# Status line and progress bar value shown once each workflow node finishes
+_NODE_PROGRESS = {
+    "plan": ("🔨 Plan ready, generating files...", 45),
+    "generate_code": ("📄 Code files generated...", 60),
+    "generate_support": ("📄 Support files generated...", 60),
+    "verify": ("✅ Verification finished...", 75),
+    "repair": ("🔧 Repair pass finished, re-verifying...", 70),
+    "integrate": ("📦 Project packaged", 90),
+}
+
+@st.cache_resource(show_spinner=False)
+def _check_api_key() -> bool:
+    """Load .env and check for the API key once per process instead of on every click"""
+    load_dotenv()
+    return bool(os.getenv("GOOGLE_API_KEY"))
+
+# OPTIMIZATION: Build the compiled LangGraph once per process and share it across
+# sessions - cache_resource because the graph is a stateful, unserializable object
+@st.cache_resource(show_spinner=False)
+def _get_workflow():
+    # Imported here, not at module top: Streamlit re-executes this script on every
+    # widget interaction, and only a generate run needs LangGraph and the LLM SDKs
+    from graph.build_graph import create_workflow
+    return create_workflow()
+
+@st.cache_resource(show_spinner=False)
+def _get_executor() -> ThreadPoolExecutor:
+    """Worker threads shared by every session - generation runs there, not on the script thread"""
+    return ThreadPoolExecutor(max_workers=int(os.getenv("GEN_WORKERS", "4")))
+
+def _run_workflow(workflow, initial_state, progress: list) -> dict:
+    """Runs on a worker thread: no st.* calls here, finished node names go to progress"""
+    # OPTIMIZATION: Stream the workflow instead of blocking on invoke() - "updates"
+    # names the node that just finished, "values" carries the full merged state, so
+    # the last value is the final state
+    final_state = {}
+    for mode, chunk in workflow.stream(initial_state, stream_mode=["updates", "values"]):
+        if mode == "values":
+            final_state = chunk
+        else:
+            progress.extend(node for node in chunk if node in _NODE_PROGRESS)
+    return final_state
+
+# OPTIMIZATION: Every rerun after a generation shows the same ZIP - list its entries
+# once. mtime is part of the key so a rewritten file is picked up. cache_resource hands
+# back the same immutable tuple instead of unpickling a copy per call; the archive itself
+# is closed again so no descriptor outlives the output cleanup.
+@st.cache_resource(show_spinner=False, max_entries=32)
+def _zip_namelist(path: str, mtime: float) -> tuple:
+    with zipfile.ZipFile(path, 'r') as zip_ref:
+        return tuple(zip_ref.namelist())
+
+# Example prompts shown in the Examples tab
+_EXAMPLES = (
+    {
+        "title": "🌐 FastAPI Todo App",
+        "query": "Create a FastAPI todo application with SQLite database, CRUD operations, and Pydantic models",
+        "category": "Web API"
+    },
+    {
+        "title": "🤖 LangChain Chatbot",
+        "query": "Build a chatbot using LangChain with conversation memory and streaming responses",
+        "category": "AI/ML"
+    },
+    {
+        "title": "🕷️ Web Scraper",
+        "query": "Create a web scraper using BeautifulSoup that extracts product data and saves to CSV",
+        "category": "Data"
+    },
+    {
+        "title": "📊 Data Analyzer",
+        "query": "Build a data analysis tool with pandas and matplotlib that reads CSV and generates visualizations",
+        "category": "Data"
+    },
+    {
+        "title": "🔐 Authentication System",
+        "query": "Create a FastAPI authentication system with JWT tokens, user registration, and login",
+        "category": "Web API"
+    },
+    {
+        "title": "📝 Blog API",
+        "query": "Build a RESTful blog API with FastAPI, SQLAlchemy ORM, and PostgreSQL support",
+        "category": "Web API"
+    },
+    {
+        "title": "🎮 CLI Game",
+        "query": "Create a simple command-line number guessing game with score tracking",
+        "category": "CLI"
+    },
+    {
+        "title": "📧 Email Sender",
+        "query": "Build an email automation script with template support and attachment handling",
+        "category": "Automation"
+    }
+)
+
+@st.cache_resource(show_spinner=False)
+def _grouped_examples() -> dict:
+    """_EXAMPLES grouped by category, in first-seen order, with their captions truncated
+    up front - built once per process"""
+    categories = {}
+    for ex in _EXAMPLES:
+        query = ex['query']
+        caption = query[:80] + "..." if len(query) > 80 else query
+        categories.setdefault(ex['category'], []).append({**ex, 'caption': caption})
+    return categories
+
+# Sessions keep only their most recent generations
+_HISTORY_SIZE = 100
+
+def _record_history(entry: dict):
+    """Append a generation to the session history and update the running totals"""
+    st.session_state.history.append(entry)
+    st.session_state.total_count += 1
+    if entry['success']:
+        st.session_state.success_count += 1
+
+def _set_query(query: str):
+    """Example button callback - runs before the script, so the query widget can still be set"""
+    st.session_state.query_input = query
+
+@st.fragment(run_every=0.5)
+def _poll_job(job: dict):
+    """Progress of the in-flight generation - this fragment reruns alone every 0.5s and
+    reruns the whole app once the run has finished, so the result is rendered"""
+    if job['future'].done():
+        st.rerun()
+    
+    label, percent = (
+        _NODE_PROGRESS[job['progress'][-1]] if job['progress']
+        else ("🔄 Running multi-agent workflow...", 30)
+    )
+    st.progress(percent, text=label)
+    st.caption("Generating your project... This may take 1-2 minutes")
+
 # Initialize session state
 if 'generated' not in st.session_state:
     st.session_state.generated = False
@@ -66,40 +179,52 @@ if 'zip_path' not in st.session_state:
     st.session_state.zip_path = None
 if 'project_name' not in st.session_state:
     st.session_state.project_name = None
+if 'result_stats' not in st.session_state:
+    # (files generated, repair iterations, package size in KB) of the last success
+    st.session_state.result_stats = None
 if 'history' not in st.session_state:
-    st.session_state.history = []
+    # OPTIMIZATION: Only the newest entries are shown, so the history is a bounded ring
+    # buffer; the totals behind the statistics are kept as counters instead
+    st.session_state.history = deque(maxlen=_HISTORY_SIZE)
+    st.session_state.total_count = 0
+    st.session_state.success_count = 0
 if 'query_input' not in st.session_state:
     st.session_state.query_input = ""
-if 'pending_example' not in st.session_state:
-    st.session_state.pending_example = None
-
-# Handle pending example - BEFORE any widgets are created
-if st.session_state.pending_example:
-    st.session_state.query_input = st.session_state.pending_example
-    st.session_state.pending_example = None
+if 'job' not in st.session_state:
+    st.session_state.job = None
 
 # Header
 st.markdown('<h1 class="main-header">🤖 AI Code Generator</h1>', unsafe_allow_html=True)
 st.markdown('<p class="sub-header">Generate complete, runnable projects from natural language</p>', unsafe_allow_html=True)
 
+# Check API key - once per process; without it generation is disabled up front
+api_key_set = _check_api_key()
+if not api_key_set:
+    st.error("❌ GOOGLE_API_KEY not found in environment variables. Please set it in .env file")
+
 # Sidebar
-with st.sidebar:
+# OPTIMIZATION: A fragment, so moving the slider or picking a model reruns only the
+# sidebar, not the whole page. Settings are read back through their widget keys.
+@st.fragment
+def _render_sidebar():
     st.header("⚙️ Settings")
     
     # Model selection
-    model_option = st.selectbox(
+    st.selectbox(
         "Model",
         ["gemini-2.5-flash", "gemini-2.5-flash-lite"],
-        help="Choose the Gemini model to use"
+        help="Choose the Gemini model to use",
+        key="model_option"
     )
     
     # Max iterations
-    max_iterations = st.slider(
+    st.slider(
         "Max Repair Iterations",
         min_value=1,
         max_value=5,
         value=3,
-        help="Maximum number of repair attempts"
+        help="Maximum number of repair attempts",
+        key="max_iterations"
     )
     
     st.divider()
@@ -108,17 +233,18 @@ with st.sidebar:
     st.header("📊 Statistics")
     col1, col2 = st.columns(2)
     with col1:
-        st.metric("Total Generated", len(st.session_state.history))
+        st.metric("Total Generated", st.session_state.total_count)
     with col2:
-        success_count = sum(1 for h in st.session_state.history if h.get('success'))
-        st.metric("Success Rate", f"{(success_count/len(st.session_state.history)*100) if st.session_state.history else 0:.0f}%")
+        success_count = st.session_state.success_count
+        total_count = st.session_state.total_count
+        st.metric("Success Rate", f"{(success_count/total_count*100) if total_count else 0:.0f}%")
     
     st.divider()
     
     # History
     st.header("📜 Recent Projects")
     if st.session_state.history:
-        for i, item in enumerate(reversed(st.session_state.history[-5:])):
+        for i, item in enumerate(islice(reversed(st.session_state.history), 5)):
             status = "✅" if item.get('success') else "❌"
             st.text(f"{status} {item['query'][:30]}...")
     else:
@@ -135,13 +261,16 @@ with st.sidebar:
         runnable code repositories from natural language.
         
         Features:
-        - Automated planning & generation
-        - Code modernization
+        - Automated planning & parallel generation
+        - Rule-based fixes for deprecated patterns
         - Runtime verification
         - Error repair loops
         - Production-ready output
         """)
 
+with st.sidebar:
+    _render_sidebar()
+
 # Main content
 tab1, tab2, tab3 = st.tabs(["🚀 Generate", "📦 Examples", "📖 Guide"])
 
@@ -152,13 +281,26 @@ with tab1:
     col1, col2 = st.columns([3, 1])
     
     with col1:
-        user_query = st.text_area(
-            "Describe your project",
-            placeholder="Example: Create a FastAPI todo app with SQLite database and CRUD operations",
-            height=100,
-            help="Be specific about what you want to build",
-            key="query_input"
-        )
+        # OPTIMIZATION: A form, so typing doesn't rerun the script on every edit - the
+        # query is only sent when Generate is pressed
+        with st.form("gen_form", border=False):
+            user_query = st.text_area(
+                "Describe your project",
+                placeholder="Example: Create a FastAPI todo app with SQLite database and CRUD operations",
+                height=100,
+                help="Be specific about what you want to build",
+                key="query_input"
+            )
+            
+            # Generate button
+            generate_col1, generate_col2, generate_col3 = st.columns([1, 2, 1])
+            with generate_col2:
+                generate_button = st.form_submit_button(
+                    "🚀 Generate Project",
+                    type="primary",
+                    use_container_width=True,
+                    disabled=not api_key_set
+                )
     
     with col2:
         st.markdown("### Quick Tips")
@@ -172,123 +314,119 @@ with tab1:
         ✅ Keep it focused
         """)
     
-    # Generate button
-    generate_col1, generate_col2, generate_col3 = st.columns([1, 2, 1])
-    with generate_col2:
-        generate_button = st.button("🚀 Generate Project", type="primary", use_container_width=True)
-    
     # Generation process
     if generate_button:
         if not user_query or not user_query.strip():
             st.error("⚠️ Please enter a project description")
-        else:
-            # Check API key
-            if not os.getenv("GOOGLE_API_KEY"):
-                st.error("❌ GOOGLE_API_KEY not found in environment variables. Please set it in .env file")
-            else:
-                try:
-                    # Progress tracking
-                    progress_bar = st.progress(0)
-                    status_text = st.empty()
-                    
-                    # Step 1: Initialize
-                    status_text.text("⚙️ Initializing workflow...")
-                    progress_bar.progress(10)
-                    
-                    workflow = create_workflow()
-                    
-                    # Step 2: Create state
-                    status_text.text("📋 Creating project plan...")
-                    progress_bar.progress(20)
+        elif st.session_state.job is None:
+            # Started on the next block; clicks while a run is in flight are ignored
+            st.session_state.job = {
+                'query': user_query,
+                'max_iterations': st.session_state.max_iterations,
+                'progress': [],
+                'future': None
+            }
+    
+    # Follow the in-flight run - also re-attaches after a rerun from any other widget
+    if st.session_state.job:
+        job = st.session_state.job
+        user_query = job['query']
+        try:
+            if job['future'] is None:
+                with st.spinner("⚙️ Initializing workflow..."):
+                    workflow = _get_workflow()
+                    from schemas.project_spec import AgentState
                     
                     initial_state = AgentState(
                         user_query=user_query,
-                        max_iterations=max_iterations
+                        max_iterations=job['max_iterations']
                     )
+                
+                # OPTIMIZATION: The workflow runs on a worker thread and a fragment polls
+                # it, so the script finishes right away and the page stays usable
+                job['future'] = _get_executor().submit(_run_workflow, workflow, initial_state, job['progress'])
+            
+            if not job['future'].done():
+                # Reruns on its own until the run finishes, then reruns the app to land below
+                _poll_job(job)
+            else:
+                st.session_state.job = None
+                final_state = job['future'].result()
+                
+                # Get result
+                zip_path = final_state.get('final_zip_path')
+                
+                if zip_path and os.path.exists(zip_path):
+                    # Store in session state
+                    st.session_state.generated = True
+                    st.session_state.zip_path = zip_path
+                    st.session_state.project_name = Path(zip_path).stem
                     
-                    # Step 3: Run workflow
-                    status_text.text("🔄 Running multi-agent workflow...")
-                    progress_bar.progress(30)
-                    
-                    # Create container for live updates
-                    log_container = st.container()
-                    
-                    with st.spinner("Generating your project... This may take 1-2 minutes"):
-                        final_state = workflow.invoke(initial_state)
+                    # Add to history
+                    _record_history({
+                        'query': user_query,
+                        'success': True,
+                        'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                        'zip_path': zip_path
+                    })
                     
-                    progress_bar.progress(90)
+                    # Results are kept in session state and shown with the download
+                    # section, so they persist across reruns; the toast is one-shot
+                    st.session_state.result_stats = (
+                        len(final_state.get('generated_files', {})),
+                        final_state.get('iteration_count', 0),
+                        os.path.getsize(zip_path) / 1024
+                    )
+                    st.toast("🎉 Project generated successfully!", icon="✅")
                     
-                    # Get result
-                    zip_path = final_state.get('final_zip_path')
-                    
-                    if zip_path and os.path.exists(zip_path):
-                        progress_bar.progress(100)
-                        status_text.text("✅ Generation complete!")
-                        
-                        # Store in session state
-                        st.session_state.generated = True
-                        st.session_state.zip_path = zip_path
-                        st.session_state.project_name = Path(zip_path).stem
-                        
-                        # Add to history
-                        st.session_state.history.append({
-                            'query': user_query,
-                            'success': True,
-                            'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                            'zip_path': zip_path
-                        })
-                        
-                        # Success message
-                        st.success("🎉 Project generated successfully!")
-                        
-                        # Display results
-                        st.markdown("---")
-                        
-                        col1, col2, col3 = st.columns(3)
-                        
-                        with col1:
-                            st.metric("Files Generated", len(final_state.get('generated_files', {})))
-                        
-                        with col2:
-                            st.metric("Repair Iterations", final_state.get('iteration_count', 0))
-                        
-                        with col3:
-                            file_size = os.path.getsize(zip_path) / 1024
-                            st.metric("Package Size", f"{file_size:.1f} KB")
-                        
-                    else:
-                        progress_bar.progress(0)
-                        st.error("❌ Generation completed but no output file was created")
-                        
-                        # Add to history as failed
-                        st.session_state.history.append({
-                            'query': user_query,
-                            'success': False,
-                            'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                        })
-                        
-                        if final_state.get('errors'):
-                            with st.expander("🔍 View Errors"):
-                                for error in final_state['errors']:
-                                    st.code(error)
-                
-                except Exception as e:
-                    st.error(f"❌ An error occurred during generation")
-                    with st.expander("🔍 Error Details"):
-                        st.code(str(e))
-                        import traceback
-                        st.code(traceback.format_exc())
+                else:
+                    st.error("❌ Generation completed but no output file was created")
                     
                     # Add to history as failed
-                    st.session_state.history.append({
+                    _record_history({
                         'query': user_query,
                         'success': False,
                         'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
                     })
+                    
+                    if final_state.get('errors'):
+                        with st.expander("🔍 View Errors"):
+                            for error in final_state['errors']:
+                                st.code(error)
+        
+        except Exception as e:
+            st.session_state.job = None
+            st.error(f"❌ An error occurred during generation")
+            with st.expander("🔍 Error Details"):
+                st.code(str(e))
+                import traceback
+                st.code(traceback.format_exc())
+            
+            # Add to history as failed
+            _record_history({
+                'query': user_query,
+                'success': False,
+                'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            })
     
     # Download section
     if st.session_state.generated and st.session_state.zip_path:
         st.markdown("---")
+        
+        # Display results
+        if st.session_state.result_stats:
+            files_generated, repair_iterations, file_size = st.session_state.result_stats
+            col1, col2, col3 = st.columns(3)
+            
+            with col1:
+                st.metric("Files Generated", files_generated)
+            
+            with col2:
+                st.metric("Repair Iterations", repair_iterations)
+            
+            with col3:
+                st.metric("Package Size", f"{file_size:.1f} KB")
+        
         st.header("📥 Download Your Project")
         
         col1, col2 = st.columns([2, 1])
@@ -296,28 +434,28 @@ with tab1:
         with col1:
             st.markdown(f"**Project:** `{st.session_state.project_name}`")
             
-            # Read zip file
-            with open(st.session_state.zip_path, 'rb') as f:
-                zip_data = f.read()
-            
-            # Download button
-            st.download_button(
-                label="⬇️ Download ZIP File",
-                data=zip_data,
-                file_name=f"{st.session_state.project_name}.zip",
-                mime="application/zip",
-                use_container_width=True
-            )
+            # Download button - OPTIMIZATION: data is a callable, so the ZIP is only read
+            # when the user actually clicks instead of being held in memory every rerun
+            if os.path.exists(st.session_state.zip_path):
+                st.download_button(
+                    label="⬇️ Download ZIP File",
+                    data=Path(st.session_state.zip_path).read_bytes,
+                    file_name=f"{st.session_state.project_name}.zip",
+                    mime="application/zip",
+                    use_container_width=True
+                )
+            else:
+                # Pruned by the integrator once older than OUTPUT_TTL_SECONDS
+                st.error("❌ This project's ZIP has expired and been deleted. Please generate it again.")
         
         with col2:
             # Preview button
             if st.button("👁️ Preview Files", use_container_width=True):
                 try:
-                    with zipfile.ZipFile(st.session_state.zip_path, 'r') as zip_ref:
-                        files = zip_ref.namelist()
-                        st.info(f"📁 **{len(files)} files in project:**")
-                        for file in files:
-                            st.text(f"  📄 {file}")
+                    files = _zip_namelist(st.session_state.zip_path, os.path.getmtime(st.session_state.zip_path))
+                    st.info(f"📁 **{len(files)} files in project:**")
+                    for file in files:
+                        st.text(f"  📄 {file}")
                 except Exception as e:
                     st.error(f"Could not read ZIP: {e}")
         
@@ -360,68 +498,22 @@ with tab2:
     st.header("📦 Example Prompts")
     st.markdown("Click any example to use it:")
     
-    examples = [
-        {
-            "title": "🌐 FastAPI Todo App",
-            "query": "Create a FastAPI todo application with SQLite database, CRUD operations, and Pydantic models",
-            "category": "Web API"
-        },
-        {
-            "title": "🤖 LangChain Chatbot",
-            "query": "Build a chatbot using LangChain with conversation memory and streaming responses",
-            "category": "AI/ML"
-        },
-        {
-            "title": "🕷️ Web Scraper",
-            "query": "Create a web scraper using BeautifulSoup that extracts product data and saves to CSV",
-            "category": "Data"
-        },
-        {
-            "title": "📊 Data Analyzer",
-            "query": "Build a data analysis tool with pandas and matplotlib that reads CSV and generates visualizations",
-            "category": "Data"
-        },
-        {
-            "title": "🔐 Authentication System",
-            "query": "Create a FastAPI authentication system with JWT tokens, user registration, and login",
-            "category": "Web API"
-        },
-        {
-            "title": "📝 Blog API",
-            "query": "Build a RESTful blog API with FastAPI, SQLAlchemy ORM, and PostgreSQL support",
-            "category": "Web API"
-        },
-        {
-            "title": "🎮 CLI Game",
-            "query": "Create a simple command-line number guessing game with score tracking",
-            "category": "CLI"
-        },
-        {
-            "title": "📧 Email Sender",
-            "query": "Build an email automation script with template support and attachment handling",
-            "category": "Automation"
-        }
-    ]
-    
-    # Group by category
-    categories = {}
-    for ex in examples:
-        cat = ex['category']
-        if cat not in categories:
-            categories[cat] = []
-        categories[cat].append(ex)
-    
     # Display by category
-    for category, items in categories.items():
+    for category, items in _grouped_examples().items():
         st.subheader(f"{category}")
         cols = st.columns(2)
         for i, example in enumerate(items):
             with cols[i % 2]:
-                # Store in pending_example and rerun
-                if st.button(f"{example['title']}", key=f"ex_{category}_{i}", use_container_width=True):
-                    st.session_state.pending_example = example['query']
-                    st.rerun()
-                st.caption(example['query'][:80] + "...")
+                # OPTIMIZATION: The callback fills the query box before the rerun the
+                # click already triggers - no second st.rerun() pass
+                st.button(
+                    f"{example['title']}",
+                    key=f"ex_{category}_{i}",
+                    use_container_width=True,
+                    on_click=_set_query,
+                    args=(example['query'],)
+                )
+                st.caption(example['caption'])
 
 with tab3:
     st.header("📖 User Guide")
@@ -430,7 +522,7 @@ with tab3:
         st.markdown("""
         ### Multi-Agent Workflow
         
-        Your request goes through 6 intelligent agents:
+        Your request goes through 5 intelligent agents:
         
         1. **Planner Agent** 📋
            - Analyzes your request
@@ -438,26 +530,21 @@ with tab3:
            - Plans all necessary files
         
         2. **Generator Agent** 🔨
-           - Writes all code files
-           - Creates configs and documentation
-           - Generates requirements.txt
-        
-        3. **Modernizer Agent** 🔄
-           - Updates deprecated patterns
-           - Uses latest API syntax
-           - Applies best practices
+           - Writes code files and support files in parallel
+           - Creates configs, documentation and requirements.txt
+           - Applies rule-based fixes for deprecated patterns
         
-        4. **Verifier Agent** ✅
+        3. **Verifier Agent** ✅
            - Checks syntax errors
            - Validates imports
            - Detects runtime issues
         
-        5. **Repair Agent** 🔧
+        4. **Repair Agent** 🔧
            - Fixes detected errors
            - Adds error handling
            - Improves code quality
         
-        6. **Integrator Agent** 📦
+        5. **Integrator Agent** 📦
            - Packages everything
            - Creates ZIP file
            - Ensures completeness
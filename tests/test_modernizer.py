@@ -0,0 +1,61 @@
+from agents.modernizer import ModernizerAgent, _modernize_type_hints
+
+
+def test_rewrites_nested_hints_and_drops_unused_imports():
+    code = (
+        "from typing import List, Dict\n"
+        "def f(x: List[Dict[str, int]]) -> Dict[str, List[int]]: ...\n"
+    )
+    assert _modernize_type_hints(code) == (
+        "\n"
+        "def f(x: list[dict[str, int]]) -> dict[str, list[int]]: ...\n"
+    )
+
+
+def test_keeps_import_still_used_outside_a_subscript():
+    code = "from typing import List\nx = List\ny: List[int] = []\n"
+    assert _modernize_type_hints(code) == "from typing import List\nx = List\ny: list[int] = []\n"
+
+
+def test_keeps_other_names_from_the_same_import():
+    code = "from typing import List, Optional\nx: Optional[List[int]] = None\n"
+    assert _modernize_type_hints(code) == "from typing import Optional\nx: Optional[list[int]] = None\n"
+
+
+def test_leaves_user_defined_generics_alone():
+    code = (
+        "from typing import List\n"
+        "class MyList(list): pass\n"
+        "x: MyList[int] = []\n"
+        "y: List[int] = []\n"
+    )
+    assert _modernize_type_hints(code) == (
+        "\n"
+        "class MyList(list): pass\n"
+        "x: MyList[int] = []\n"
+        "y: list[int] = []\n"
+    )
+
+
+def test_rewrites_module_attribute_hints():
+    code = "import typing as t\nx: t.List[int] = []\n"
+    assert _modernize_type_hints(code) == "import typing as t\nx: list[int] = []\n"
+
+
+def test_leaves_string_contents_alone():
+    code = "from typing import List\ns = 'List[int]'\n"
+    assert _modernize_type_hints(code) == code
+
+
+def test_returns_none_for_unparseable_source():
+    assert _modernize_type_hints("from typing import List\ndef f(:\n    x: List[int]\n") is None
+
+
+def test_quick_fixes_fall_back_to_textual_rewrite_for_unparseable_source():
+    code = "from typing import List\ndef f(:\n    x: List[int]\n"
+    assert ModernizerAgent()._apply_quick_fixes(code) == "def f(:\n    x: list[int]\n"
+
+
+def test_apply_quick_fixes_skips_non_python_files():
+    files = {"README.md": "from typing import List\nx: List[int]\n"}
+    assert ModernizerAgent().apply_quick_fixes(dict(files)) == files
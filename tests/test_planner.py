@@ -0,0 +1,53 @@
+import json
+
+import pytest
+from langchain_groq import ChatGroq
+
+from agents.planner import PlannerAgent, _patch_json_error
+
+
+@pytest.fixture
+def planner():
+    return PlannerAgent(ChatGroq(model="test-model", api_key="test"))
+
+
+def _error(json_str: str) -> json.JSONDecodeError:
+    with pytest.raises(json.JSONDecodeError) as info:
+        json.loads(json_str)
+    return info.value
+
+
+def test_patch_inserts_missing_comma():
+    broken = '{"a": 1 "b": 2}'
+    assert json.loads(_patch_json_error(broken, _error(broken))) == {"a": 1, "b": 2}
+
+
+def test_patch_quotes_single_quoted_key():
+    broken = "{'name': 1}"
+    assert _patch_json_error(broken, _error(broken)) == '{"name": 1}'
+
+
+def test_patch_quotes_bare_key():
+    broken = '{name: 1}'
+    assert _patch_json_error(broken, _error(broken)) == '{"name": 1}'
+
+
+def test_patch_gives_up_on_unknown_defect():
+    broken = '{"a": tru}'
+    assert _patch_json_error(broken, _error(broken)) is None
+
+
+def test_decode_leaves_apostrophes_in_values_alone(planner):
+    assert planner._decode_with_patches('{"description": "It\'s a tool"}') == {"description": "It's a tool"}
+
+
+def test_decode_fixes_single_quoted_key_next_to_apostrophe_value(planner):
+    assert planner._decode_with_patches("{'name': \"it's\", \"a\": 1,}") == {"name": "it's", "a": 1}
+
+
+def test_decode_fixes_several_defects(planner):
+    assert planner._decode_with_patches('{name: "x", "files": [1, 2,],}') == {"name": "x", "files": [1, 2]}
+
+
+def test_decode_returns_none_for_unfixable_key(planner):
+    assert planner._decode_with_patches("{'it''s': 1}") is None
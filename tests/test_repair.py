@@ -0,0 +1,52 @@
+import pytest
+from langchain_groq import ChatGroq
+
+from agents.repair import RepairAgent
+
+
+@pytest.fixture
+def repair():
+    return RepairAgent(ChatGroq(model="test-model", api_key="test"))
+
+
+def test_dict_access_rewrites_reads_only(repair):
+    code = "def f(d):\n    d['k'] = d['v']\n    return d[\"x\"], d[0]\n"
+    assert repair._fix_dict_access(code) == (
+        "def f(d):\n    d['k'] = d.get('v')\n    return d.get(\"x\"), d[0]\n"
+    )
+
+
+def test_dict_access_leaves_assignment_and_del_alone(repair):
+    code = "def f(d):\n    d['k'] = 1\n    del d['z']\n"
+    assert repair._fix_dict_access(code) == code
+
+
+def test_dict_access_skips_attribute_targets(repair):
+    code = "x = a.b['c']\n"
+    assert repair._fix_dict_access(code) == code
+
+
+def test_dict_access_falls_back_to_regex_for_unparseable_source(repair):
+    assert repair._fix_dict_access("def f(d:\n    return d['k']\n") == "def f(d:\n    return d.get('k')\n"
+
+
+def test_async_await_marks_only_the_function_that_awaits(repair):
+    code = "def outer():\n    def inner():\n        await g()\n    return inner\n"
+    assert repair._fix_async_await(code) == (
+        "def outer():\n    async def inner():\n        await g()\n    return inner\n"
+    )
+
+
+def test_async_await_leaves_existing_async_functions_alone(repair):
+    code = "def outer():\n    async def inner():\n        await g()\n    return inner\n"
+    assert repair._fix_async_await(code) == code
+
+
+def test_async_await_looks_past_nested_lambdas(repair):
+    code = "def f():\n    x = lambda: 1\n    await g()\n"
+    assert repair._fix_async_await(code) == "async def f():\n    x = lambda: 1\n    await g()\n"
+
+
+def test_async_await_falls_back_to_lines_for_unparseable_source(repair):
+    code = "def f(:\n    await g()\ndef h():\n    return 1\n"
+    assert repair._fix_async_await(code) == "async def f(:\n    await g()\ndef h():\n    return 1\n"
@@ -0,0 +1,58 @@
+"""
+Helpers for rewriting Python source at AST node positions
+"""
+
+import ast
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+
+# OPTIMIZATION: Shared parse cache - the modernizer's fixes, the verifier's checks and
+# the repair fixers all parse through here, so each distinct file content is parsed
+# once per process no matter how many stages look at it. Trees must not be mutated.
+@lru_cache(maxsize=128)
+def parse_source(content: str) -> Tuple[Optional[ast.AST], str]:
+    """Parse Python source once - returns (tree, "") or (None, error message)"""
+    try:
+        return ast.parse(content), ""
+    except SyntaxError as e:
+        return None, f"Syntax error at line {e.lineno}: {e.msg}"
+    except Exception as e:
+        return None, str(e)
+
+
+def line_offsets(source: bytes) -> List[int]:
+    """Byte offset of the start of each line (ast positions are 1-based lines, byte columns)"""
+    offsets = [0]
+    for line in source.splitlines(keepends=True):
+        offsets.append(offsets[-1] + len(line))
+    return offsets
+
+
+def node_source(source: bytes, offsets: List[int], node: ast.AST) -> str:
+    """Original source text of an AST node"""
+    start = offsets[node.lineno - 1] + node.col_offset
+    end = offsets[node.end_lineno - 1] + node.end_col_offset
+    return source[start:end].decode('utf-8')
+
+
+def replace_nodes(content: str, replacements: List[Tuple[ast.AST, str]], keyword_only: bool = False) -> str:
+    """Splice replacement text over node spans, keeping the rest of the file byte-for-byte
+    
+    With keyword_only, only the leading 'def' keyword of each node is replaced.
+    """
+    if not replacements:
+        return content
+    
+    source = content.encode('utf-8')
+    offsets = line_offsets(source)
+    spans = []
+    for node, text in replacements:
+        start = offsets[node.lineno - 1] + node.col_offset
+        end = start + 3 if keyword_only else offsets[node.end_lineno - 1] + node.end_col_offset
+        spans.append((start, end, text.encode('utf-8')))
+    
+    # Apply from the end so earlier offsets stay valid
+    for start, end, text in sorted(spans, reverse=True):
+        source = source[:start] + text + source[end:]
+    return source.decode('utf-8')
@@ -0,0 +1,49 @@
+"""
+Helpers for driving async agent code from synchronous call sites
+"""
+
+import asyncio
+import threading
+from typing import Any, Coroutine, Optional, TypeVar
+
+T = TypeVar("T")
+
+# OPTIMIZATION: One long-lived event loop for all sync -> async calls. Async HTTP
+# clients (e.g. the LLM client's connection pool) are bound to the loop they first
+# ran on; a fresh asyncio.run() per call would throw those keep-alive connections
+# away every time instead of reusing them across the whole workflow.
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    """Start the shared background event loop on first use"""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(
+                target=_loop.run_forever,
+                name="agent-event-loop",
+                daemon=True
+            ).start()
+        return _loop
+
+
+def run_sync(coro: Coroutine[Any, Any, T]) -> T:
+    """
+    Run a coroutine to completion from synchronous code.
+
+    The coroutine runs on a shared background event loop, so it works the same
+    whether or not the caller is itself inside a running loop (e.g. a FastAPI
+    handler), and connection pools persist between calls.
+    """
+    loop = _get_loop()
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop:
+        raise RuntimeError("run_sync() cannot be called from the shared agent event loop")
+
+    return asyncio.run_coroutine_threadsafe(coro, loop).result()
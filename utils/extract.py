@@ -0,0 +1,35 @@
+"""
+Helpers for pulling generated code out of LLM responses
+"""
+
+import re
+
+# Fenced code block in an LLM response: ```python\n...``` or ```python:file.py\n...```
+CODE_BLOCK_RE = re.compile(r'```[\w.:/-]*\n(.*?)```', re.DOTALL)
+
+# Opening fence only - the outermost block runs from here to the last ``` in the response
+OPENING_FENCE_RE = re.compile(r'```[\w.:/-]*\n')
+
+
+def extract_code(content: str, fallback_to_raw: bool = False, outermost: bool = False) -> str:
+    """
+    Return the contents of the first fenced code block in one regex pass.
+
+    With outermost set, the block instead runs from the first opening fence to the
+    last closing one, so files that contain fenced blocks of their own (markdown
+    docs, examples) come back whole.
+
+    Without a code block, returns the stripped response when fallback_to_raw is
+    set, otherwise an empty string so callers can keep their original code.
+    """
+    if outermost:
+        opening = OPENING_FENCE_RE.search(content)
+        if opening:
+            end = content.rfind('```')
+            if end >= opening.end():
+                return content[opening.end():end].strip()
+
+    match = CODE_BLOCK_RE.search(content)
+    if match:
+        return match.group(1).strip()
+    return content.strip() if fallback_to_raw else ""
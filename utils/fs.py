@@ -1,5 +1,5 @@
 from pathlib import Path
-from typing import List
+from typing import Dict, List
 import shutil
 
 class FileSystemUtils:
@@ -17,6 +17,18 @@ class FileSystemUtils:
         with open(path, 'w', encoding='utf-8') as f:
             f.write(content)
     
+    @staticmethod
+    def write_files(root: Path, files: Dict[str, str]) -> None:
+        """Write many files under root, creating each directory only once"""
+        paths = {relative: root / relative for relative in files}
+        
+        # OPTIMIZATION: One mkdir per distinct directory instead of one per file
+        for directory in {path.parent for path in paths.values()}:
+            directory.mkdir(parents=True, exist_ok=True)
+        
+        for relative, path in paths.items():
+            path.write_bytes(files[relative].encode('utf-8'))
+    
     @staticmethod
     def read_file(path: Path) -> str:
         """Read file content"""
@@ -6,6 +6,43 @@ import json
 import re
 from typing import Tuple, Optional
 
+_DECODER = json.JSONDecoder()
+
+# Cleaning / repair patterns, compiled once at import.
+# _RE_CLEAN: each named group is one independent fix; the group name picks the replacement.
+_RE_CLEAN = re.compile(
+    r'(?P<md_json>```json\s*)'
+    r'|(?P<md>```\s*)'
+    r'|(?P<line_comment>//[^\n]*)'
+    r'|(?P<block_comment>/\*.*?\*/)'
+    r'|(?P<trailing_comma>,(?=(?:\s|//[^\n]*|/\*.*?\*/)*[}\]]))'
+    r'|(?P<obj_obj>}\s*(?=\{))'
+    r'|(?P<arr_obj>]\s*(?=\{))'
+    r'|(?P<obj_arr>}\s*(?=\[))',
+    re.DOTALL
+)
+_CLEAN_REPLACEMENTS = {
+    'md_json': '',
+    'md': '',
+    'line_comment': '',
+    'block_comment': '',
+    'trailing_comma': '',
+    'obj_obj': '},',
+    'arr_obj': '],',
+    'obj_arr': '},',
+}
+_RE_STR_NEWLINE_STR = re.compile(r'"\s*\n\s*"')
+_RE_UNQUOTED_KEY = re.compile(r'(?<!")(\b\w+\b)(?=\s*:)')
+# A double-quoted string (left as-is) or a single-quoted one (group 1 = its body)
+_RE_QUOTED_STR = re.compile(r'"(?:[^"\\]|\\.)*"|\'((?:[^\'\\]|\\.)*)\'')
+
+def _to_double_quoted(match: re.Match) -> str:
+    """Rewrite a single-quoted string match as a JSON string"""
+    body = match.group(1)
+    if body is None:
+        return match.group(0)
+    return '"' + body.replace("\\'", "'").replace('"', '\\"') + '"'
+
 class JSONValidator:
     """Validates and repairs JSON strings"""
     
@@ -43,24 +80,12 @@ class JSONValidator:
     def _clean_json(json_str: str) -> str:
         """Clean common JSON formatting issues"""
         
-        # Remove markdown code blocks
-        json_str = re.sub(r'```json\s*', '', json_str)
-        json_str = re.sub(r'```\s*', '', json_str)
-        
-        # Remove comments
-        json_str = re.sub(r'//.*?$', '', json_str, flags=re.MULTILINE)
-        json_str = re.sub(r'/\*.*?\*/', '', json_str, flags=re.DOTALL)
-        
-        # Fix trailing commas
-        json_str = re.sub(r',(\s*[}\]])', r'\1', json_str)
+        # OPTIMIZATION: Markdown fences, comments, trailing commas and missing commas
+        # between objects/arrays are all fixed in a single alternation pass
+        json_str = _RE_CLEAN.sub(lambda m: _CLEAN_REPLACEMENTS[m.lastgroup], json_str)
         
-        # Fix missing commas between objects
-        json_str = re.sub(r'}\s*{', '},{', json_str)
-        json_str = re.sub(r']\s*{', '],{', json_str)
-        json_str = re.sub(r'}\s*\[', '},[', json_str)
-        
-        # Fix missing commas after strings
-        json_str = re.sub(r'"\s*\n\s*"', '",\n"', json_str)
+        # Fix missing commas after strings (needs the string on both sides, so separate)
+        json_str = _RE_STR_NEWLINE_STR.sub('",\n"', json_str)
         
         return json_str
     
@@ -75,11 +100,7 @@ class JSONValidator:
             json_str += '}' * (open_braces - close_braces)
         elif close_braces > open_braces:
             # Remove extra closing braces from end
-            excess = close_braces - open_braces
-            for _ in range(excess):
-                last_brace = json_str.rfind('}')
-                if last_brace != -1:
-                    json_str = json_str[:last_brace] + json_str[last_brace+1:]
+            json_str = JSONValidator._drop_last(json_str, '}', close_braces - open_braces)
         
         # Balance brackets
         open_brackets = json_str.count('[')
@@ -87,56 +108,69 @@ class JSONValidator:
         if open_brackets > close_brackets:
             json_str += ']' * (open_brackets - close_brackets)
         elif close_brackets > open_brackets:
-            excess = close_brackets - open_brackets
-            for _ in range(excess):
-                last_bracket = json_str.rfind(']')
-                if last_bracket != -1:
-                    json_str = json_str[:last_bracket] + json_str[last_bracket+1:]
+            json_str = JSONValidator._drop_last(json_str, ']', close_brackets - open_brackets)
+        
+        # Convert single-quoted strings to double-quoted ones. Runs before the key fix
+        # so 'key': isn't quoted twice.
+        # OPTIMIZATION: One regex scan that skips over existing "..." strings, instead of
+        # a per-line blanket replace that also broke apostrophes like "don't"
+        json_str = _RE_QUOTED_STR.sub(_to_double_quoted, json_str)
         
         # Fix unquoted property names
         # Pattern: word followed by colon, not already quoted
-        json_str = re.sub(r'(?<!")(\b\w+\b)(?=\s*:)', r'"\1"', json_str)
-        
-        # Convert single quotes to double quotes (risky but often needed)
-        # Be smarter about it - only in specific contexts
-        lines = json_str.split('\n')
-        for i, line in enumerate(lines):
-            # If line has : or , it's likely a JSON line
-            if ':' in line or ',' in line:
-                # Replace single quotes with double quotes
-                lines[i] = line.replace("'", '"')
-        json_str = '\n'.join(lines)
+        json_str = _RE_UNQUOTED_KEY.sub(r'"\1"', json_str)
         
         return json_str
     
+    @staticmethod
+    def _drop_last(text: str, char: str, count: int) -> str:
+        """Remove the last `count` occurrences of char in one right-to-left scan"""
+        
+        # OPTIMIZATION: Locate every excess closer first, then rebuild the string once,
+        # instead of re-slicing the whole string for each one
+        cut_points = []
+        pos = len(text)
+        while len(cut_points) < count:
+            pos = text.rfind(char, 0, pos)
+            if pos == -1:
+                break
+            cut_points.append(pos)
+        
+        pieces = []
+        start = 0
+        for cut in reversed(cut_points):
+            pieces.append(text[start:cut])
+            start = cut + 1
+        pieces.append(text[start:])
+        return ''.join(pieces)
+    
     @staticmethod
     def extract_json_objects(text: str) -> list:
         """Extract all JSON objects from text"""
         
+        # OPTIMIZATION: Jump between '{' candidates with str.find and let the C
+        # decoder parse each object and report where it ends
         objects = []
-        brace_count = 0
-        start = -1
-        
-        for i, char in enumerate(text):
-            if char == '{':
-                if brace_count == 0:
-                    start = i
-                brace_count += 1
-            elif char == '}':
-                brace_count -= 1
-                if brace_count == 0 and start != -1:
-                    potential_json = text[start:i+1]
-                    try:
-                        obj = json.loads(potential_json)
-                        objects.append(obj)
-                    except:
-                        # Try to repair this object
-                        try:
-                            cleaned = JSONValidator._clean_json(potential_json)
-                            obj = json.loads(cleaned)
-                            objects.append(obj)
-                        except:
-                            pass
-                    start = -1
-        
-        return objects
\ No newline at end of file
+        i = 0
+        cleaned = False
+        
+        while True:
+            i = text.find('{', i)
+            if i == -1:
+                break
+            try:
+                obj, i = _DECODER.raw_decode(text, i)
+                objects.append(obj)
+                continue
+            except json.JSONDecodeError:
+                pass
+            
+            # Try to repair: clean the rest of the text once and keep scanning in it
+            if not cleaned:
+                text = JSONValidator._clean_json(text[i:])
+                i = 0
+                cleaned = True
+                continue
+            i += 1
+        
+        return objects
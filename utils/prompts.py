@@ -0,0 +1,19 @@
+"""
+Prompt template loading shared by the agents
+"""
+
+from functools import lru_cache
+from pathlib import Path
+
+PROMPTS_DIR = Path(__file__).parent.parent / "prompts"
+
+
+@lru_cache(maxsize=None)
+def load_prompt(name: str) -> str:
+    """
+    Read a prompt template from the prompts/ directory.
+
+    Cached per process, and resolved relative to the package rather than the
+    current working directory, so agents work from any launch directory.
+    """
+    return (PROMPTS_DIR / name).read_text(encoding="utf-8")